@@ -0,0 +1,409 @@
+"""Latency and throughput benchmark for the API.
+
+Seeds a dedicated database, drives realistic workloads through the ASGI app
+in-process and reports throughput and p50/p95/p99 latency per endpoint.
+
+Run from the backend directory against a local MongoDB (MONGO_URL):
+
+    python benchmark.py --users 500 --gigs 2000 --output results.json
+    python benchmark.py --baseline results.json --fail-on-regression
+
+The `serialization` scenario records process CPU time rather than latency for
+full pages of the list endpoints, with lean responses off and then on: once for
+encoding a page alone and once for whole requests issued one at a time. The
+paired rows show the CPU saved by the fast path; under --mock the request rows
+are dominated by mongomock's own query evaluation.
+
+`--mock` runs against mongomock-motor instead. It cannot evaluate the rating
+update pipeline or return post-update documents from find_one_and_update, so
+the gig acceptance race and rating burst scenarios are skipped in that mode.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# Background jobs would compete with the measured workload
+os.environ.setdefault('RATING_RECONCILE_INTERVAL', '0')
+os.environ.setdefault('ADMIN_STATS_REFRESH_INTERVAL', '0')
+os.environ.setdefault('NOTIFICATION_ARCHIVE_INTERVAL', '0')
+# All load comes from one client address and a few users, so rate limits would
+# measure the limiter instead of the endpoints
+for route in ('SIGNUP', 'LOGIN', 'CREATE_GIG', 'BOOK_SERVICE', 'CREATE_RATING'):
+    os.environ.setdefault(f'RATE_LIMIT_{route}', 'off')
+# The serialization scenario pages the /admin list endpoints as the first seeded user
+os.environ.setdefault('ADMIN_EMAILS', 'user0@bench.example')
+
+import httpx
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+import server
+
+SCENARIOS = ['login_spike', 'feed_browsing', 'accept_race', 'rating_burst', 'mixed', 'serialization']
+MOCK_UNSUPPORTED = {'accept_race', 'rating_burst'}
+CATEGORIES = ['tutoring', 'delivery', 'design', 'coding', 'errands', 'moving']
+PASSWORD = 'benchmark-password'
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, label: str, elapsed: float, ok: bool):
+        self.samples.setdefault(label, []).append(elapsed)
+        if not ok:
+            self.errors[label] = self.errors.get(label, 0) + 1
+
+    def report(self, wall_time: float) -> dict:
+        report = {}
+        for label, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            report[label] = {
+                "count": len(ordered),
+                "errors": self.errors.get(label, 0),
+                "throughput": round(len(ordered) / wall_time, 2) if wall_time else 0.0,
+                "p50_ms": percentile(ordered, 50),
+                "p95_ms": percentile(ordered, 95),
+                "p99_ms": percentile(ordered, 99),
+            }
+        return report
+
+def percentile(ordered: list, pct: float) -> float:
+    if not ordered:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return round(ordered[min(rank, len(ordered) - 1)] * 1000, 3)
+
+class Bench:
+    def __init__(self, http: httpx.AsyncClient, concurrency: int):
+        self.http = http
+        self.concurrency = concurrency
+        self.users = []
+        self.gig_ids = []
+        self.service_ids = []
+        self.rating_orders = []
+
+    async def call(self, recorder: Recorder, label: str, method: str, url: str,
+                   ok=(200,), token: str = None, **kwargs):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        started = time.perf_counter()
+        response = await self.http.request(method, url, headers=headers, **kwargs)
+        recorder.record(label, time.perf_counter() - started, response.status_code in ok)
+        return response
+
+    async def run(self, jobs: list) -> float:
+        """Run zero-argument coroutine factories with bounded concurrency."""
+        queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+
+        async def worker():
+            while not queue.empty():
+                await queue.get_nowait()()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return time.perf_counter() - started
+
+    # ---------- seeding ----------
+    async def seed(self, args):
+        db = server.db
+        for collection in ['users', 'gigs', 'services', 'orders', 'ratings', 'notifications',
+                           'refresh_tokens', 'name_fanout']:
+            await db[collection].delete_many({})
+        await server.ensure_indexes()
+        rng = random.Random(args.seed)
+        now = datetime.now(timezone.utc)
+        password_hash = server.hash_password(PASSWORD)
+
+        users = []
+        for i in range(args.users):
+            user = server.User(
+                name=f"User {i}", email=f"user{i}@bench.example", college="Bench College",
+                terms_accepted=True, created_at=now - timedelta(minutes=args.users - i)
+            )
+            users.append({**user.model_dump(), "password_hash": password_hash})
+        await insert_batches(db.users, users)
+        self.users = [(u['id'], u['email'], server.token_auth.access_token(server.User(**u))) for u in users]
+
+        def timestamp():
+            return now - timedelta(seconds=rng.randint(0, 30 * 86400))
+
+        gigs = []
+        for i in range(args.gigs):
+            poster = rng.choice(users)
+            gigs.append(server.Gig(
+                title=f"Gig {i} {rng.choice(CATEGORIES)}", description="Benchmark gig " * 8,
+                category=rng.choice(CATEGORIES), price=rng.randint(50, 2000),
+                poster_id=poster['id'], poster_name=poster['name'], created_at=timestamp()
+            ).model_dump())
+        await insert_batches(db.gigs, gigs)
+        self.gig_ids = [g['id'] for g in gigs]
+
+        services = []
+        for i in range(args.services):
+            creator = rng.choice(users)
+            services.append(server.Service(
+                title=f"Service {i}", description="Benchmark service " * 8, price=rng.randint(50, 2000),
+                creator_id=creator['id'], creator_name=creator['name'], created_at=timestamp()
+            ).model_dump())
+        await insert_batches(db.services, services)
+        self.service_ids = [s['id'] for s in services]
+
+        orders = []
+        for _ in range(args.orders):
+            buyer, provider = rng.sample(users, 2)
+            amount = rng.randint(50, 2000)
+            orders.append(server.Order(
+                order_type="service", service_id=rng.choice(self.service_ids) if self.service_ids else None,
+                buyer_id=buyer['id'], buyer_name=buyer['name'],
+                provider_id=provider['id'], provider_name=provider['name'],
+                total_amount=amount, commission=amount * 0.15,
+                status=rng.choice(['active', 'completed', 'completed', 'cancelled']), created_at=timestamp()
+            ).model_dump())
+        await insert_batches(db.orders, orders)
+        # Completed orders nobody has rated yet feed the rating burst
+        completed = [o for o in orders if o['status'] == 'completed']
+        rated, self.rating_orders = completed[:args.ratings], completed[args.ratings:]
+
+        ratings = [server.Rating(
+            order_id=o['id'], from_user_id=o['buyer_id'], to_user_id=o['provider_id'],
+            rating=rng.randint(1, 5), created_at=timestamp()
+        ).model_dump() for o in rated]
+        await insert_batches(db.ratings, ratings)
+
+        notifications = [server.Notification(
+            user_id=rng.choice(users)['id'], message="Benchmark notification", type="review",
+            read=rng.random() < 0.5, created_at=timestamp()
+        ).model_dump() for _ in range(args.notifications)]
+        await insert_batches(db.notifications, notifications)
+        # Lifespan warmup snapshotted the feeds before seeding; drop the stale snapshots
+        server.open_gig_feed.invalidate()
+        server.service_feed.invalidate()
+
+    # ---------- scenarios ----------
+    async def login_spike(self, recorder: Recorder, requests: int) -> float:
+        users = random.choices(self.users, k=requests)
+        return await self.run([
+            (lambda email=email: self.call(recorder, "POST /api/auth/login", "POST", "/api/auth/login",
+                                           ok=(200, 429), json={"email": email, "password": PASSWORD}))
+            for _, email, _ in users
+        ])
+
+    async def feed_browsing(self, recorder: Recorder, requests: int) -> float:
+        async def browse(token):
+            response = await self.call(recorder, "GET /api/gigs?status=open", "GET", "/api/gigs",
+                                       params={"status": "open", "limit": 20})
+            cursor = response.json().get('next_cursor') if response.status_code == 200 else None
+            if cursor:
+                await self.call(recorder, "GET /api/gigs?status=open (page 2)", "GET", "/api/gigs",
+                                params={"status": "open", "limit": 20, "cursor": cursor})
+            await self.call(recorder, "GET /api/gigs?category", "GET", "/api/gigs",
+                            params={"status": "open", "category": random.choice(CATEGORIES), "limit": 20})
+            await self.call(recorder, "GET /api/services", "GET", "/api/services", params={"limit": 20})
+            if self.gig_ids:
+                await self.call(recorder, "GET /api/gigs/{id}", "GET", f"/api/gigs/{random.choice(self.gig_ids)}")
+
+        return await self.run([
+            (lambda token=token: browse(token)) for _, _, token in random.choices(self.users, k=requests)
+        ])
+
+    async def accept_race(self, recorder: Recorder, requests: int) -> float:
+        contenders = min(8, len(self.users) - 1)
+        targets = [gig_id for gig_id in self.gig_ids][:max(requests // contenders, 1)]
+        docs = await server.db.gigs.find({"id": {"$in": targets}, "status": "open"}, {"_id": 0}).to_list(None)
+        jobs = []
+        for gig in docs:
+            rivals = [u for u in self.users if u[0] != gig['poster_id']][:contenders]
+            for _, _, token in rivals:
+                jobs.append(lambda gig_id=gig['id'], token=token: self.call(
+                    recorder, "POST /api/gigs/{id}/accept", "POST", f"/api/gigs/{gig_id}/accept",
+                    ok=(200, 400), token=token
+                ))
+        random.shuffle(jobs)
+        elapsed = await self.run(jobs)
+        duplicates = await server.db.orders.aggregate([
+            {"$match": {"gig_id": {"$in": [gig['id'] for gig in docs]}}},
+            {"$group": {"_id": "$gig_id", "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}},
+        ]).to_list(None)
+        if duplicates:
+            print(f"  accept_race: {len(duplicates)} gigs accepted more than once", file=sys.stderr)
+        return elapsed
+
+    async def rating_burst(self, recorder: Recorder, requests: int) -> float:
+        tokens = {user_id: token for user_id, _, token in self.users}
+        orders = self.rating_orders[:requests]
+        return await self.run([
+            (lambda order=order: self.call(
+                recorder, "POST /api/ratings", "POST", "/api/ratings", token=tokens[order['buyer_id']],
+                json={"order_id": order['id'], "to_user_id": order['provider_id'], "rating": random.randint(1, 5)}
+            )) for order in orders
+        ])
+
+    async def mixed(self, recorder: Recorder, requests: int) -> float:
+        routes = [
+            (30, "GET /api/auth/me", lambda uid: "/api/auth/me"),
+            (20, "GET /api/orders", lambda uid: "/api/orders"),
+            (20, "GET /api/notifications", lambda uid: "/api/notifications"),
+            (10, "GET /api/notifications/unread-count", lambda uid: "/api/notifications/unread-count"),
+            (10, "GET /api/gigs/my/posted", lambda uid: "/api/gigs/my/posted"),
+            (10, "GET /api/ratings/user/{id}", lambda uid: f"/api/ratings/user/{uid}"),
+        ]
+        weights = [weight for weight, _, _ in routes]
+        jobs = []
+        for user_id, _, token in random.choices(self.users, k=requests):
+            _, label, path = random.choices(routes, weights=weights)[0]
+            jobs.append(lambda label=label, url=path(user_id), token=token: self.call(
+                recorder, label, "GET", url, token=token
+            ))
+        return await self.run(jobs)
+
+    async def serialization(self, recorder: Recorder, requests: int) -> float:
+        _, _, token = self.users[0]
+        routes = [
+            ("GET /api/gigs", "/api/gigs", "gigs", server.lean_gig),
+            ("GET /api/admin/gigs", "/api/admin/gigs", "gigs", server.lean_gig),
+            ("GET /api/admin/orders", "/api/admin/orders", "orders", server.lean_order),
+            ("GET /api/admin/users", "/api/admin/users", "users", server.lean_user),
+        ]
+        lean_responses = server.LEAN_RESPONSES
+        started = time.perf_counter()
+        try:
+            for label, url, collection, lean in routes:
+                route = next(r for r in server.app.routes
+                             if getattr(r, 'path', None) == url and 'GET' in r.methods)
+                docs, _ = await server.paginate(server.db[collection], {}, server.PAGE_SIZE_MAX, None, lean.projection)
+                for mode in ("validated", "lean"):
+                    server.LEAN_RESPONSES = mode == "lean"
+                    for _ in range(requests):
+                        # Encoding alone, as FastAPI does it for the route's response_model
+                        cpu = time.process_time()
+                        if server.LEAN_RESPONSES:
+                            lean.page(docs, None).body
+                        else:
+                            content = await serialize_response(field=route.response_field,
+                                                               response_content=lean.page(docs, None))
+                            JSONResponse(content).body
+                        recorder.record(f"{label} encode [{mode}]", time.process_time() - cpu, True)
+                    for _ in range(max(requests // 10, 1)):
+                        cpu = time.process_time()
+                        response = await self.http.get(url, params={"limit": server.PAGE_SIZE_MAX},
+                                                       headers={"Authorization": f"Bearer {token}"})
+                        recorder.record(f"{label} request [{mode}]", time.process_time() - cpu,
+                                        response.status_code == 200)
+        finally:
+            server.LEAN_RESPONSES = lean_responses
+        return time.perf_counter() - started
+
+async def insert_batches(collection, docs: list, size: int = 1000):
+    for start in range(0, len(docs), size):
+        await collection.insert_many(docs[start:start + size])
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Return human-readable regressions of current vs baseline results."""
+    regressions = []
+    for scenario, endpoints in current.items():
+        for label, stats in endpoints.items():
+            before = baseline.get(scenario, {}).get(label)
+            if not before:
+                continue
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+                if before[metric] and stats[metric] > before[metric] * (1 + threshold):
+                    regressions.append(f"{scenario} {label} {metric}: {before[metric]} -> {stats[metric]}")
+            if before['throughput'] and stats['throughput'] < before['throughput'] * (1 - threshold):
+                regressions.append(f"{scenario} {label} throughput: {before['throughput']} -> {stats['throughput']}")
+    return regressions
+
+def print_savings(endpoints: dict):
+    for label, stats in endpoints.items():
+        if not label.endswith("[validated]"):
+            continue
+        lean = endpoints.get(label.replace("[validated]", "[lean]"))
+        if lean and stats['p50_ms']:
+            saved = stats['p50_ms'] - lean['p50_ms']
+            print(f"{label.replace(' [validated]', ''):<40} CPU p50 {stats['p50_ms']} -> {lean['p50_ms']} ms "
+                  f"({saved / stats['p50_ms'] * 100:.0f}% saved)")
+
+def print_report(results: dict, baseline: dict):
+    print(f"{'scenario':<14} {'endpoint':<40} {'count':>6} {'err':>4} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for scenario, endpoints in results.items():
+        for label, stats in endpoints.items():
+            line = (f"{scenario:<14} {label:<40} {stats['count']:>6} {stats['errors']:>4} {stats['throughput']:>9} "
+                    f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+            before = baseline.get(scenario, {}).get(label) if baseline else None
+            if before and before['p95_ms']:
+                line += f"  p95 {(stats['p95_ms'] / before['p95_ms'] - 1) * 100:+.1f}%"
+            print(line)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API against a seeded database")
+    parser.add_argument('--mock', action='store_true', help="use mongomock-motor instead of MONGO_URL")
+    parser.add_argument('--db-name', default='needify_benchmark', help="database to seed (it is wiped first)")
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--gigs', type=int, default=1000)
+    parser.add_argument('--services', type=int, default=300)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--ratings', type=int, default=300)
+    parser.add_argument('--notifications', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=500, help="requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--baseline', help="compare against a previous --output file")
+    parser.add_argument('--threshold', type=float, default=0.10, help="allowed relative regression")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    server.db.name = args.db_name
+    if args.mock:
+        from mongomock_motor import AsyncMongoMockClient
+        server.db.connect(AsyncMongoMockClient(tz_aware=True))
+
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    if args.mock:
+        skipped = [name for name in scenarios if name in MOCK_UNSUPPORTED]
+        if skipped:
+            print(f"Skipping {', '.join(skipped)} under --mock", file=sys.stderr)
+        scenarios = [name for name in scenarios if name not in MOCK_UNSUPPORTED]
+
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as http:
+            bench = Bench(http, args.concurrency)
+            started = time.perf_counter()
+            await bench.seed(args)
+            print(f"Seeded {args.db_name} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+            results = {}
+            for name in scenarios:
+                recorder = Recorder()
+                wall_time = await getattr(bench, name)(recorder, args.requests)
+                results[name] = recorder.report(wall_time)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    print_report(results, baseline)
+    if 'serialization' in results:
+        print_savings(results['serialization'])
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"run_id": str(uuid.uuid4()), "args": vars(args), "results": results}, f, indent=2)
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    asyncio.run(main())
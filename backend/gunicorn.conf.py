@@ -0,0 +1,48 @@
+"""Gunicorn settings for running several uvicorn workers on one host.
+
+Run from the backend directory:
+
+    gunicorn -c gunicorn.conf.py server:app
+
+The app is not preloaded, so every worker imports it after the fork and opens
+its own Motor pool, caches and background jobs in the lifespan, warming up
+before it accepts connections. On SIGTERM a worker stops accepting, gives
+in-flight requests (and open notification streams) SHUTDOWN_REQUEST_TIMEOUT
+seconds to finish, then flushes queued notification writes and exits.
+Periodic maintenance runs on one worker at a time through Mongo leases.
+
+Cross-worker state goes through Mongo: set NOTIFICATION_BROKER=changestream
+(replica set) for live notifications and RATE_LIMIT_BACKEND=mongo for shared
+rate limits. User and feed caches stay per worker, bounded by their TTLs.
+"""
+import multiprocessing
+import os
+
+from uvicorn.workers import UvicornWorker
+
+SHUTDOWN_REQUEST_TIMEOUT = int(os.environ.get('SHUTDOWN_REQUEST_TIMEOUT', '20'))
+NOTIFICATION_DRAIN_TIMEOUT = float(os.environ.get('NOTIFICATION_DRAIN_TIMEOUT', '10'))
+# Total Mongo connections the host may open, split evenly between workers
+MONGO_POOL_BUDGET = int(os.environ.get('MONGO_POOL_BUDGET', '200'))
+
+
+class AppWorker(UvicornWorker):
+    """UvicornWorker with a bounded wait for open connections at shutdown, so
+    long-lived streams cannot hold a worker until gunicorn kills it and skips
+    the lifespan drain."""
+
+    CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, "timeout_graceful_shutdown": SHUTDOWN_REQUEST_TIMEOUT}
+
+
+# Exported before the fork so workers see the count and their pool share
+workers = int(os.environ.setdefault('WEB_CONCURRENCY', str(multiprocessing.cpu_count())))
+os.environ.setdefault('MONGO_MAX_POOL_SIZE', str(max(MONGO_POOL_BUDGET // workers, 10)))
+
+bind = os.environ.get('BIND', '0.0.0.0:8001')
+worker_class = AppWorker
+preload_app = False
+keepalive = 5
+# Covers warmup, during which a worker does not heartbeat
+timeout = int(os.environ.get('WORKER_TIMEOUT', '120'))
+# Request wait plus the notification flush, with headroom before SIGKILL
+graceful_timeout = SHUTDOWN_REQUEST_TIMEOUT + int(NOTIFICATION_DRAIN_TIMEOUT) + 5
@@ -0,0 +1,89 @@
+"""One-time migration converting ISO-string timestamps to native BSON datetimes.
+
+Run from the backend directory:
+
+    python migrate_datetimes.py [--batch-size 1000] [--collection orders] [--restart]
+
+Documents are streamed in _id order and rewritten with unordered bulk writes.
+Progress is checkpointed per collection/field in the `migrations` collection,
+so an interrupted run resumes from the last converted batch.
+"""
+import argparse
+import asyncio
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from server import db, logger
+
+DATETIME_FIELDS = {
+    "users": ["created_at"],
+    "gigs": ["created_at"],
+    "services": ["created_at"],
+    "orders": ["created_at", "cancelled_at"],
+    "ratings": ["created_at"],
+    "notifications": ["created_at"],
+}
+
+def parse_timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+async def migrate_field(collection: str, field: str, batch_size: int, restart: bool):
+    checkpoint_id = f"datetimes:{collection}:{field}"
+    if restart:
+        await db.migrations.delete_one({"_id": checkpoint_id})
+    checkpoint = await db.migrations.find_one({"_id": checkpoint_id}) or {}
+    if checkpoint.get('done'):
+        logger.info("%s.%s already migrated", collection, field)
+        return
+    last_id = checkpoint.get('last_id')
+    converted = skipped = 0
+    while True:
+        query = {field: {"$type": "string"}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = await db[collection].find(query, {field: 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+        ops = []
+        for doc in docs:
+            try:
+                value = parse_timestamp(doc[field])
+            except ValueError:
+                skipped += 1
+                logger.warning("Skipping %s %s: unparseable %s %r", collection, doc['_id'], field, doc[field])
+                continue
+            # Matching on the old value leaves concurrent rewrites untouched
+            ops.append(UpdateOne({"_id": doc['_id'], field: doc[field]}, {"$set": {field: value}}))
+        if ops:
+            result = await db[collection].bulk_write(ops, ordered=False)
+            converted += result.modified_count
+        last_id = docs[-1]['_id']
+        await db.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_id": last_id, "updated_at": datetime.now(timezone.utc)}, "$inc": {"converted": len(ops)}},
+            upsert=True
+        )
+        logger.info("%s.%s: %d converted so far", collection, field, converted)
+    await db.migrations.update_one({"_id": checkpoint_id}, {"$set": {"done": True}}, upsert=True)
+    logger.info("%s.%s done: %d converted, %d skipped", collection, field, converted, skipped)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--collection', choices=sorted(DATETIME_FIELDS), help="only migrate this collection")
+    parser.add_argument('--restart', action='store_true', help="ignore saved checkpoints")
+    args = parser.parse_args()
+    db.connect()
+    try:
+        for collection, fields in DATETIME_FIELDS.items():
+            if args.collection and collection != args.collection:
+                continue
+            for field in fields:
+                await migrate_field(collection, field, args.batch_size, args.restart)
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
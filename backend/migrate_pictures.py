@@ -0,0 +1,65 @@
+"""One-time migration moving data-URL profile pictures into the blob store.
+
+Run from the backend directory:
+
+    python migrate_pictures.py [--batch-size 100] [--dry-run]
+
+Each `data:` picture is decoded, downscaled and stored like an upload, and the
+user keeps only the resulting /api/pictures/<hash> URL. Users are matched on
+their old picture value, so a picture changed mid-run is left alone, and the
+run can simply be repeated after an interruption. Pictures that cannot be
+decoded are cleared.
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+
+from fastapi import HTTPException
+from pymongo import UpdateOne
+
+from server import db, logger, store_picture
+
+def decode_data_url(value: str) -> bytes:
+    header, _, payload = value.partition(',')
+    if not header.endswith(';base64'):
+        raise ValueError("not base64 encoded")
+    return base64.b64decode(payload, validate=True)
+
+async def migrate(batch_size: int, dry_run: bool):
+    query = {"picture": {"$regex": "^data:"}}
+    moved = cleared = 0
+    while True:
+        users = await db.users.find(query, {"_id": 1, "id": 1, "picture": 1}).limit(batch_size).to_list(batch_size)
+        if not users:
+            break
+        ops = []
+        for user in users:
+            try:
+                picture = await store_picture(decode_data_url(user['picture']))
+                moved += 1
+            except (ValueError, binascii.Error, HTTPException) as exc:
+                logger.warning("Clearing undecodable picture of user %s: %s", user['id'], exc)
+                picture = None
+                cleared += 1
+            ops.append(UpdateOne({"_id": user['_id'], "picture": user['picture']}, {"$set": {"picture": picture}}))
+        if dry_run:
+            logger.info("Dry run: would update %d users", len(ops))
+            break
+        await db.users.bulk_write(ops, ordered=False)
+        logger.info("%d pictures moved, %d cleared so far", moved, cleared)
+    logger.info("Done: %d pictures moved, %d cleared", moved, cleared)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--dry-run', action='store_true', help="process one batch without updating users")
+    args = parser.parse_args()
+    db.connect()
+    try:
+        await migrate(args.batch_size, args.dry_run)
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,34 +1,537 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, File, Query, Request, UploadFile, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from typing import Generic, List, Literal, Optional, TypeVar
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 import uuid
+import json
+import csv
+import io
+import base64
+import binascii
+import hashlib
+import re
+import socket
+import math
+import secrets
 from datetime import datetime, timezone, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
 import bcrypt
+from pymongo import ReadPreference, ReturnDocument, UpdateOne
+from pymongo.read_concern import ReadConcern
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 import jwt
+import gridfs
+import orjson
+from PIL import Image, ImageOps, UnidentifiedImageError
+from pymongo import monitoring
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-app = FastAPI()
 api_router = APIRouter(prefix="/api")
+# Operational endpoints served outside /api (Prometheus scrapes)
+ops_router = APIRouter()
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 JWT_SECRET = os.environ.get('JWT_SECRET', 'needify_secret_key_2024')
 JWT_ALGORITHM = 'HS256'
 
+# Access tokens are short-lived and carry the claims routes need (id, name, college)
+# so requests authenticate without a user lookup; refresh tokens are single-use and
+# rotated on every refresh
+ACCESS_TOKEN_TTL = int(os.environ.get('ACCESS_TOKEN_TTL', '900'))
+REFRESH_TOKEN_TTL_DAYS = float(os.environ.get('REFRESH_TOKEN_TTL_DAYS', '30'))
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '10000'))
+# Seconds between polls of the shared revocation list; revocations made by other
+# workers take up to this long to apply
+TOKEN_REVOCATION_SYNC_INTERVAL = float(os.environ.get('TOKEN_REVOCATION_SYNC_INTERVAL', '5'))
+
+# bcrypt work runs on a bounded thread pool so logins never block the event loop
+PASSWORD_POOL_SIZE = int(os.environ.get('PASSWORD_POOL_SIZE', '4'))
+PASSWORD_QUEUE_LIMIT = int(os.environ.get('PASSWORD_QUEUE_LIMIT', '32'))
+
+# Authenticated users are cached in-process to skip a Mongo lookup per request
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '60'))
+
+# Accounts allowed to use the /admin/* routes (comma-separated emails)
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()}
+
+# Refuse to start when a route query would fall back to a collection scan
+INDEX_CHECK_ON_STARTUP = os.environ.get('INDEX_CHECK_ON_STARTUP', 'false').lower() == 'true'
+
+# List endpoints are keyset-paginated on (created_at, id)
+PAGE_SIZE_DEFAULT = int(os.environ.get('PAGE_SIZE_DEFAULT', '50'))
+PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', '200'))
+
+# Seconds between full rating recomputations that repair drift in the running totals (0 disables)
+RATING_RECONCILE_INTERVAL = float(os.environ.get('RATING_RECONCILE_INTERVAL', '3600'))
+
+# Live notification delivery: "local" publishes in-process on insert, "changestream"
+# tails the notifications collection so every worker sees every insert
+NOTIFICATION_BROKER = os.environ.get('NOTIFICATION_BROKER', 'local')
+NOTIFICATION_STREAM_QUEUE = int(os.environ.get('NOTIFICATION_STREAM_QUEUE', '100'))
+NOTIFICATION_KEEPALIVE = float(os.environ.get('NOTIFICATION_KEEPALIVE', '15'))
+
+# Multi-document writes (gig accept, cancellations) run in transactions; needs a replica set
+MONGO_TRANSACTIONS = os.environ.get('MONGO_TRANSACTIONS', 'false').lower() == 'true'
+
+# Notifications are written off the request path in batches
+NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE', '100'))
+NOTIFICATION_FLUSH_INTERVAL = float(os.environ.get('NOTIFICATION_FLUSH_INTERVAL', '0.05'))
+NOTIFICATION_QUEUE_LIMIT = int(os.environ.get('NOTIFICATION_QUEUE_LIMIT', '10000'))
+# Failed notification inserts are requeued this many times, NOTIFICATION_RETRY_DELAY apart
+NOTIFICATION_WRITE_RETRIES = int(os.environ.get('NOTIFICATION_WRITE_RETRIES', '3'))
+NOTIFICATION_RETRY_DELAY = float(os.environ.get('NOTIFICATION_RETRY_DELAY', '0.5'))
+NOTIFICATION_DRAIN_TIMEOUT = float(os.environ.get('NOTIFICATION_DRAIN_TIMEOUT', '10'))
+
+# Read notifications are kept NOTIFICATION_READ_RETENTION_DAYS after being read, then
+# moved to notifications_archive ("archive"), deleted by a TTL index ("ttl") or kept ("off")
+NOTIFICATION_RETENTION = os.environ.get('NOTIFICATION_RETENTION', 'archive')
+NOTIFICATION_READ_RETENTION_DAYS = float(os.environ.get('NOTIFICATION_READ_RETENTION_DAYS', '30'))
+NOTIFICATION_ARCHIVE_INTERVAL = float(os.environ.get('NOTIFICATION_ARCHIVE_INTERVAL', '3600'))
+NOTIFICATION_ARCHIVE_BATCH_SIZE = int(os.environ.get('NOTIFICATION_ARCHIVE_BATCH_SIZE', '1000'))
+NOTIFICATION_READ_MAX_IDS = 500
+
+# Public gig/service feeds are served from an in-memory snapshot; the TTL bounds
+# staleness when another worker handled the write
+FEED_CACHE_TTL = float(os.environ.get('FEED_CACHE_TTL', '5'))
+FEED_SNAPSHOT_LIMIT = int(os.environ.get('FEED_SNAPSHOT_LIMIT', '1000'))
+FEED_CACHE_PAGES = int(os.environ.get('FEED_CACHE_PAGES', '256'))
+
+# Per-screen endpoints return the first SCREEN_SLICE_SIZE items of each list with
+# its total count; the home screen shows HOME_RECENT_GIGS open gigs
+SCREEN_SLICE_SIZE = int(os.environ.get('SCREEN_SLICE_SIZE', '20'))
+HOME_RECENT_GIGS = int(os.environ.get('HOME_RECENT_GIGS', '3'))
+
+# Search pages by relevance offset, so results are capped at this depth
+SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', '1000'))
+SEARCH_PRICE_BUCKETS = [0, 100, 250, 500, 1000, 5000]
+
+# Admin dashboard stats are read from rollups refreshed in the background; each
+# refresh recomputes the trailing lookback window of daily buckets
+ADMIN_STATS_REFRESH_INTERVAL = float(os.environ.get('ADMIN_STATS_REFRESH_INTERVAL', '300'))
+ADMIN_STATS_LOOKBACK_DAYS = int(os.environ.get('ADMIN_STATS_LOOKBACK_DAYS', '30'))
+
+# Motor client pool and timeouts; compressors is a comma list such as "zstd,snappy,zlib"
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '0'))
+MONGO_MAX_CONNECTING = int(os.environ.get('MONGO_MAX_CONNECTING', '2'))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '0')) or None
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '10000')) or None
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_COMPRESSORS = os.environ.get('MONGO_COMPRESSORS', '')
+
+# Read routing for the heavy read-only paths. Each route takes a read preference
+# (primary, primaryPreferred, secondary, secondaryPreferred, nearest) and an
+# optional read concern level; secondaries may serve data that lags recent writes
+READ_ROUTES = {
+    route: (
+        os.environ.get(f'MONGO_READ_PREFERENCE_{route.upper()}', 'primary'),
+        os.environ.get(f'MONGO_READ_CONCERN_{route.upper()}') or None,
+    )
+    for route in ('feeds', 'search', 'admin')
+}
+
+# Read paths return stored documents through orjson without re-validating them
+# into models; set to false to fall back to response_model validation
+LEAN_RESPONSES = os.environ.get('LEAN_RESPONSES', 'true').lower() == 'true'
+
+# Profile name changes are copied into the denormalized *_name fields in the
+# background, one bulk write of up to NAME_FANOUT_BATCH_SIZE documents at a time
+# with a pause between batches
+NAME_FANOUT_BATCH_SIZE = int(os.environ.get('NAME_FANOUT_BATCH_SIZE', '500'))
+NAME_FANOUT_BATCH_DELAY = float(os.environ.get('NAME_FANOUT_BATCH_DELAY', '0.05'))
+
+# Profile pictures are downscaled to PICTURE_MAX_DIMENSION and stored by content
+# hash in GridFS ("gridfs") or under BLOB_DIR ("local", single host only)
+BLOB_STORE = os.environ.get('BLOB_STORE', 'gridfs')
+BLOB_DIR = Path(os.environ.get('BLOB_DIR', str(ROOT_DIR / 'blobs')))
+PICTURE_MAX_BYTES = int(os.environ.get('PICTURE_MAX_BYTES', str(5 * 1024 * 1024)))
+PICTURE_MAX_PIXELS = int(os.environ.get('PICTURE_MAX_PIXELS', str(40_000_000)))
+PICTURE_MAX_DIMENSION = int(os.environ.get('PICTURE_MAX_DIMENSION', '512'))
+PICTURE_QUALITY = int(os.environ.get('PICTURE_QUALITY', '85'))
+
+# Admin exports stream one cursor batch per response chunk
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+# Per-route token buckets as "<requests>/<seconds>", keyed by client IP for the
+# auth routes and by user id for writes; RATE_LIMIT_<ROUTE> overrides a budget and
+# "off" disables it. The "local" backend keeps buckets per process, "mongo" shares
+# them across workers through the rate_limits collection
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'local')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000'))
+# Take the client IP from X-Forwarded-For; only safe behind a proxy that sets it
+RATE_LIMIT_TRUST_FORWARDED = os.environ.get('RATE_LIMIT_TRUST_FORWARDED', 'false').lower() == 'true'
+RATE_LIMITS = {
+    route: (os.environ.get(f'RATE_LIMIT_{route.upper()}', budget), scope)
+    for route, budget, scope in [
+        ("signup", "20/3600", "ip"),
+        ("login", "30/60", "ip"),
+        ("create_gig", "20/60", "user"),
+        ("book_service", "30/60", "user"),
+        ("create_rating", "30/60", "user"),
+    ]
+}
+
+# Requests get a 503 while SHED_MAX_IN_FLIGHT are already running or the sampled
+# event-loop lag reaches SHED_MAX_EVENT_LOOP_LAG seconds (0 disables either check)
+SHED_MAX_IN_FLIGHT = int(os.environ.get('SHED_MAX_IN_FLIGHT', '1000'))
+SHED_MAX_EVENT_LOOP_LAG = float(os.environ.get('SHED_MAX_EVENT_LOOP_LAG', '1.0'))
+
+# Worker count in multi-worker mode (set by gunicorn.conf.py); readiness probes
+# give up on the Mongo ping after HEALTH_CHECK_TIMEOUT seconds
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+HEALTH_CHECK_TIMEOUT = float(os.environ.get('HEALTH_CHECK_TIMEOUT', '2'))
+
+# Mongo commands slower than this are logged as structured warnings (0 disables)
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '0'))
+# Seconds between event-loop lag samples exported on /metrics (0 disables)
+EVENT_LOOP_LAG_INTERVAL = float(os.environ.get('EVENT_LOOP_LAG_INTERVAL', '0.5'))
+
+# ========== METRICS ==========
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Request duration by route template',
+    ['method', 'route']
+)
+HTTP_REQUESTS = Counter('http_requests_total', 'Requests by route template and status', ['method', 'route', 'status'])
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests currently being handled')
+MONGO_COMMAND_DURATION = Histogram(
+    'mongo_command_duration_seconds', 'Mongo command latency by collection and command',
+    ['collection', 'command'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+MONGO_COMMAND_DOCUMENTS = Counter(
+    'mongo_command_documents_total', 'Documents returned or written by Mongo commands',
+    ['collection', 'command']
+)
+MONGO_COMMAND_FAILURES = Counter('mongo_command_failures_total', 'Failed Mongo commands', ['collection', 'command'])
+MONGO_POOL_CHECKED_OUT = Gauge('mongo_pool_checked_out', 'Connections in use per server', ['address'])
+MONGO_POOL_CONNECTIONS = Gauge('mongo_pool_connections', 'Open connections per server', ['address'])
+MONGO_POOL_WAITING = Gauge('mongo_pool_waiting', 'Operations waiting for a connection per server', ['address'])
+MONGO_POOL_CHECKOUT_SECONDS = Histogram(
+    'mongo_pool_checkout_seconds', 'Time spent waiting to check out a connection',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+)
+MONGO_POOL_CHECKOUT_FAILURES = Counter('mongo_pool_checkout_failures_total', 'Failed connection checkouts', ['reason'])
+EVENT_LOOP_LAG = Gauge('event_loop_lag_seconds', 'Most recent event-loop scheduling delay')
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    'event_loop_lag_sampled_seconds', 'Sampled event-loop scheduling delay',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+def _redact(value):
+    """Keep the shape of a query for logging, dropping the values."""
+    if isinstance(value, dict):
+        return {key: _redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact(item) for item in value[:5]]
+    return "?"
+
+def _reply_documents(command_name: str, reply) -> int:
+    cursor = reply.get('cursor')
+    if cursor is not None:
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', ())))
+    if command_name == 'findAndModify':
+        return 0 if reply.get('value') is None else 1
+    n = reply.get('n')
+    return n if isinstance(n, int) else 0
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Driver command listener recording latency and document counts per
+    collection/command. Called synchronously on driver threads, so it only
+    does counter updates and dict bookkeeping."""
+
+    def __init__(self):
+        self.pending = {}
+
+    def started(self, event):
+        if event.command_name == 'getMore':
+            collection = event.command.get('collection')
+        else:
+            collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ""
+        self.pending[(event.connection_id, event.request_id)] = (collection, event.command if SLOW_QUERY_MS else None)
+
+    def succeeded(self, event):
+        collection, command = self.pending.pop((event.connection_id, event.request_id), ("", None))
+        duration = event.duration_micros / 1e6
+        documents = _reply_documents(event.command_name, event.reply)
+        MONGO_COMMAND_DURATION.labels(collection, event.command_name).observe(duration)
+        MONGO_COMMAND_DOCUMENTS.labels(collection, event.command_name).inc(documents)
+        if command is not None and duration * 1000 >= SLOW_QUERY_MS:
+            shape = {key: _redact(command[key]) for key in ('filter', 'sort', 'pipeline', 'query', 'updates', 'deletes') if key in command}
+            logger.warning(json.dumps({
+                "event": "slow_query",
+                "collection": collection,
+                "command": event.command_name,
+                "duration_ms": round(duration * 1000, 3),
+                "documents": documents,
+                "shape": shape,
+            }))
+
+    def failed(self, event):
+        collection, _ = self.pending.pop((event.connection_id, event.request_id), ("", None))
+        MONGO_COMMAND_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(collection, event.command_name).inc()
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool listener tracking per-server usage and checkout waits.
+    Checkouts run synchronously on one driver thread, so the wait is timed
+    with a thread-local start."""
+
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.servers = {}
+        self.checkout_failures = 0
+        self.wait_max = 0.0
+
+    def _server(self, address) -> tuple:
+        key = f"{address[0]}:{address[1]}"
+        if key not in self.servers:
+            self.servers[key] = {"connections": 0, "checked_out": 0, "waiting": 0}
+        return key, self.servers[key]
+
+    def _update(self, address, field: str, delta: int, gauge):
+        with self.lock:
+            key, server = self._server(address)
+            server[field] += delta
+        gauge.labels(key).inc(delta)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._update(event.address, "connections", 1, MONGO_POOL_CONNECTIONS)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event.address, "connections", -1, MONGO_POOL_CONNECTIONS)
+
+    def connection_check_out_started(self, event):
+        self.local.started = time.perf_counter()
+        self._update(event.address, "waiting", 1, MONGO_POOL_WAITING)
+
+    def connection_check_out_failed(self, event):
+        self._update(event.address, "waiting", -1, MONGO_POOL_WAITING)
+        with self.lock:
+            self.checkout_failures += 1
+        MONGO_POOL_CHECKOUT_FAILURES.labels(str(event.reason)).inc()
+
+    def connection_checked_out(self, event):
+        waited = time.perf_counter() - getattr(self.local, 'started', time.perf_counter())
+        self._update(event.address, "waiting", -1, MONGO_POOL_WAITING)
+        self._update(event.address, "checked_out", 1, MONGO_POOL_CHECKED_OUT)
+        MONGO_POOL_CHECKOUT_SECONDS.observe(waited)
+        self.wait_max = max(self.wait_max, waited)
+
+    def connection_checked_in(self, event):
+        self._update(event.address, "checked_out", -1, MONGO_POOL_CHECKED_OUT)
+
+    def stats(self) -> dict:
+        with self.lock:
+            servers = {key: dict(server) for key, server in self.servers.items()}
+        busiest = max((server['checked_out'] for server in servers.values()), default=0)
+        return {
+            "max_pool_size": self.max_pool_size,
+            "connections": sum(server['connections'] for server in servers.values()),
+            "checked_out": sum(server['checked_out'] for server in servers.values()),
+            "waiting": sum(server['waiting'] for server in servers.values()),
+            "saturation": round(busiest / self.max_pool_size, 4),
+            "checkout_failures": self.checkout_failures,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "servers": servers,
+        }
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request. Requests are labelled by the
+    matched route template so path parameters don't multiply series."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # The router stores the matched route on the shared scope
+            route = scope.get('route')
+            route_path = route.path if route is not None else "unmatched"
+            HTTP_REQUEST_DURATION.labels(scope['method'], route_path).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(scope['method'], route_path, str(status_code)).inc()
+
+class EventLoopMonitor:
+    """Measures how late a periodic sleep wakes up, i.e. how long callbacks
+    wait behind blocking work on the event loop."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lag = 0.0
+        self.lag_max = 0.0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag = max(loop.time() - started - self.interval, 0.0)
+            self.lag_max = max(self.lag_max, self.lag)
+            EVENT_LOOP_LAG.set(self.lag)
+            EVENT_LOOP_LAG_SECONDS.observe(self.lag)
+
+    def stats(self) -> dict:
+        return {"lag_ms": round(self.lag * 1000, 3), "lag_max_ms": round(self.lag_max * 1000, 3)}
+
+event_loop_monitor = EventLoopMonitor(EVENT_LOOP_LAG_INTERVAL)
+
+class StatsCollector:
+    """Exports the numeric fields of in-process component stats (the dicts
+    behind the /admin/* endpoints) as gauges, read at scrape time."""
+
+    def __init__(self, sources: dict):
+        self.sources = sources
+
+    def collect(self):
+        family = GaugeMetricFamily('app_component_stat', 'In-process component stats', labels=['component', 'stat'])
+        for component, stats in self.sources.items():
+            for stat, value in stats().items():
+                if isinstance(value, (int, float)):
+                    family.add_metric([component, stat], float(value))
+        yield family
+
+mongo_command_metrics = MongoCommandMetrics()
+mongo_pool_metrics = MongoPoolMetrics(MONGO_MAX_POOL_SIZE)
+
+# ========== DATABASE ==========
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+class Database:
+    """Motor client built from the MONGO_* settings on app startup rather than
+    at import. Collections are reached as `db.<name>` like a Motor database;
+    `db.reads(route)` gives the same database with that route's read
+    preference and read concern."""
+
+    def __init__(self, url: str, name: str):
+        self.url = url
+        self.name = name
+        self.client = None
+        self.database = None
+        self.routes = {}
+
+    def connect(self, client=None):
+        """Create the client, or adopt `client` (e.g. a mock in tooling). Idempotent."""
+        if self.client is not None:
+            return
+        routes = {}
+        for route, (preference, concern) in READ_ROUTES.items():
+            if preference not in READ_PREFERENCES:
+                raise RuntimeError(f"Unknown read preference {preference!r} for {route} reads")
+            routes[route] = (READ_PREFERENCES[preference], ReadConcern(concern) if concern else None)
+        if client is None:
+            options = {}
+            if MONGO_COMPRESSORS:
+                options['compressors'] = MONGO_COMPRESSORS
+            client = AsyncIOMotorClient(
+                self.url,
+                tz_aware=True,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                maxConnecting=MONGO_MAX_CONNECTING,
+                maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                event_listeners=[mongo_command_metrics, mongo_pool_metrics],
+                **options
+            )
+        self.client = client
+        self.database = client[self.name]
+        self.routes = {
+            route: client.get_database(self.name, read_preference=preference, read_concern=concern)
+            for route, (preference, concern) in routes.items()
+        }
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+        self.database = None
+        self.routes = {}
+
+    def reads(self, route: str):
+        self._connected()
+        return self.routes[route]
+
+    def _connected(self):
+        if self.database is None:
+            raise RuntimeError("Database is not connected; db.connect() runs on app startup")
+        return self.database
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._connected(), name)
+
+    def __getitem__(self, name):
+        return self._connected()[name]
+
+db = Database(os.environ['MONGO_URL'], os.environ['DB_NAME'])
+
 # ========== MODELS ==========
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -58,7 +561,17 @@ class UserUpdate(BaseModel):
     name: Optional[str] = None
     college: Optional[str] = None
     phone: Optional[str] = None
-    picture: Optional[str] = None
+    picture: Optional[str] = Field(None, max_length=2048)
+
+class Principal(BaseModel):
+    """The authenticated caller as carried in access token claims. Routes that
+    need the rest of the profile load it with get_profile_user."""
+    id: str
+    name: str
+    college: str
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
 
 class Gig(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -84,7 +597,8 @@ class GigAccept(BaseModel):
     gig_id: str
 
 class GigUpdateStatus(BaseModel):
-    status: str
+    # "accepted" is only reachable through POST /gigs/{id}/accept, which records the acceptor and order
+    status: Literal["completed", "cancelled"]
 
 class Service(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -127,6 +641,7 @@ class Rating(BaseModel):
     from_user_name: str = ""
     to_user_id: str
     to_user_name: str = ""
+    service_id: Optional[str] = None  # set when the rating counts toward a service
     rating: float
     review: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -144,8 +659,75 @@ class Notification(BaseModel):
     message: str
     type: str  # gig_accepted, completed, cancelled, review
     read: bool = False
+    read_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class NotificationRead(BaseModel):
+    """Mark the listed notifications read, or every notification created at or before `before`."""
+    ids: Optional[List[str]] = Field(None, max_length=NOTIFICATION_READ_MAX_IDS)
+    before: Optional[datetime] = None
+
+# ========== SERIALIZATION ==========
+class LeanJSONResponse(JSONResponse):
+    """orjson-encoded JSON. Datetimes render like pydantic's (RFC 3339, Z for UTC)."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+class LeanModel:
+    """Response fast path for documents the app wrote through `model`. Queries
+    use `projection` to fetch exactly the model's fields and absent fields take
+    the model's static defaults, so a stored document can be encoded as-is
+    instead of being built into a model and validated again by response_model."""
+
+    def __init__(self, model):
+        self.model = model
+        self.projection = {"_id": 0, **{name: 1 for name in model.model_fields}}
+        self.defaults = {
+            name: field.default for name, field in model.model_fields.items()
+            if not field.is_required() and field.default_factory is None
+        }
+        self.field_count = len(model.model_fields)
+
+    def fill(self, doc: dict) -> dict:
+        # A projected document with every field present needs no defaults
+        if len(doc) < self.field_count:
+            for name, value in self.defaults.items():
+                doc.setdefault(name, value)
+        return doc
+
+    def one(self, doc: dict):
+        """Respond with a document fetched with `projection`."""
+        if not LEAN_RESPONSES:
+            return self.model(**doc)
+        return LeanJSONResponse(self.fill(doc))
+
+    def page(self, docs: List[dict], next_cursor: Optional[str]):
+        """Respond with a page of documents fetched with `projection`."""
+        if not LEAN_RESPONSES:
+            return {"items": docs, "next_cursor": next_cursor}
+        return LeanJSONResponse({"items": self.items(docs), "next_cursor": next_cursor})
+
+    def items(self, docs: List[dict]) -> List[dict]:
+        """Documents fetched with `projection`, ready for a LeanJSONResponse."""
+        if not LEAN_RESPONSES:
+            return [self.model(**doc).model_dump() for doc in docs]
+        fill = self.fill
+        return [fill(doc) for doc in docs]
+
+    def instance(self, obj: BaseModel):
+        """Respond with an already validated model instance."""
+        if not LEAN_RESPONSES:
+            return obj
+        return LeanJSONResponse(obj.model_dump())
+
+lean_user = LeanModel(User)
+lean_gig = LeanModel(Gig)
+lean_service = LeanModel(Service)
+lean_order = LeanModel(Order)
+lean_rating = LeanModel(Rating)
+lean_notification = LeanModel(Notification)
+
 # ========== HELPER FUNCTIONS ==========
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -153,37 +735,1715 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
-def create_token(user_id: str) -> str:
-    payload = {
-        'user_id': user_id,
-        'exp': datetime.now(timezone.utc) + timedelta(days=7)
-    }
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+class PasswordPool:
+    """Bounded executor for bcrypt calls with backpressure and timing stats. The
+    app lifespan owns the executor; outside it one is started on first use."""
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user_id = payload.get('user_id')
-        if not user_id:
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.executor = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hash_total = 0.0
+        self.hash_max = 0.0
+
+    async def run(self, fn, *args):
+        if self.pending >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many authentication requests, please retry",
+                headers={"Retry-After": "1"}
+            )
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            result = fn(*args)
+            return result, started - submitted, time.perf_counter() - started
+
+        if self.executor is None:
+            self.start()
+        self.pending += 1
+        try:
+            result, waited, worked = await asyncio.get_running_loop().run_in_executor(self.executor, job)
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self.hash_total += worked
+        self.hash_max = max(self.hash_max, worked)
+        return result
+
+    def stats(self) -> dict:
+        done = self.completed or 1
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.pending,
+            "queued": max(self.pending - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_avg_ms": round(self.wait_total / done * 1000, 3),
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "hash_avg_ms": round(self.hash_total / done * 1000, 3),
+            "hash_max_ms": round(self.hash_max * 1000, 3),
+        }
+
+    def start(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password")
+
+    def shutdown(self):
+        executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+password_pool = PasswordPool(PASSWORD_POOL_SIZE, PASSWORD_QUEUE_LIMIT)
+
+class LocalCacheBackend:
+    """In-process LRU with per-entry TTL. Shared backends (e.g. Redis) implement
+    the same async get/set/delete interface and serialize values themselves."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+
+    async def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        self.entries.pop(key, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+class UserCache:
+    """User lookups by id with hit/miss accounting on top of a cache backend."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, user_id: str) -> Optional[User]:
+        user = await self.backend.get(user_id)
+        if user is not None:
+            self.hits += 1
+            return user
+        self.misses += 1
+        doc = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
+        if not doc:
+            return None
+        user = User(**doc)
+        await self.backend.set(user_id, user)
+        return user
+
+    async def invalidate(self, user_id: str):
+        self.invalidations += 1
+        await self.backend.delete(user_id)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.backend) if hasattr(self.backend, '__len__') else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+user_cache = UserCache(LocalCacheBackend(USER_CACHE_SIZE, USER_CACHE_TTL))
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+class TokenAuth:
+    """Issues and verifies access/refresh token pairs.
+
+    Access tokens are HS256 JWTs that carry the caller's id, name and college,
+    so most requests authenticate without touching Mongo. Verified tokens are
+    kept in an LRU keyed by the whole token string (never the signature alone,
+    which would accept a forged payload), so repeat requests skip the HMAC and
+    claim parsing as well. Revoked token ids and users whose claims changed are
+    checked in memory; both are written to token_revocations, which every
+    worker polls. Tokens issued before a user's claims changed fall back to a
+    user lookup until they expire.
+
+    Refresh tokens are opaque, stored as digests and single-use: each refresh
+    rotates them within a family, and presenting a rotated one revokes the
+    whole family since it means the token leaked.
+    """
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        self.verified = OrderedDict()
+        self.revoked = {}          # jti -> token exp
+        self.claims_changed = {}   # user_id -> (changed_at, expires)
+        self.synced_at = None
+        self.hits = 0
+        self.misses = 0
+        self.lookups = 0
+        self.rejected = 0
+        self.refreshed = 0
+        self.reused = 0
+
+    def access_token(self, user) -> str:
+        # A fractional iat orders tokens against claim changes made in the same second
+        now = time.time()
+        payload = {
+            'sub': user.id,
+            'name': user.name,
+            'college': user.college,
+            'type': 'access',
+            'jti': uuid.uuid4().hex,
+            'iat': now,
+            'exp': int(now) + ACCESS_TOKEN_TTL,
+        }
+        return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+    async def issue(self, user, family: Optional[str] = None) -> dict:
+        refresh_token = secrets.token_urlsafe(32)
+        now = datetime.now(timezone.utc)
+        await db.refresh_tokens.insert_one({
+            "_id": token_digest(refresh_token),
+            "family": family or uuid.uuid4().hex,
+            "user_id": user.id,
+            "used_at": None,
+            "created_at": now,
+            "expires_at": now + timedelta(days=REFRESH_TOKEN_TTL_DAYS),
+        })
+        return {"token": self.access_token(user), "refresh_token": refresh_token, "expires_in": ACCESS_TOKEN_TTL}
+
+    def decode(self, token: str) -> tuple:
+        """Verify a token, returning (principal, user_id, jti, iat, exp). The
+        principal is None for pre-rotation tokens, which only carry user_id."""
+        entry = self.verified.get(token)
+        if entry is not None:
+            self.hits += 1
+            if entry[4] <= time.time():
+                del self.verified[token]
+                raise HTTPException(status_code=401, detail="Token expired")
+            self.verified.move_to_end(token)
+            return entry
+        self.misses += 1
+        try:
+            payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(status_code=401, detail="Token expired")
+        except jwt.InvalidTokenError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        if payload.get('type') == 'access':
+            try:
+                principal = Principal(id=payload['sub'], name=payload['name'], college=payload['college'])
+            except (KeyError, ValueError):
+                raise HTTPException(status_code=401, detail="Invalid token")
+            entry = (principal, principal.id, payload.get('jti'), payload['iat'], payload['exp'])
+        elif payload.get('user_id') and 'exp' in payload:
+            entry = (None, payload['user_id'], None, 0, payload['exp'])
+        else:
             raise HTTPException(status_code=401, detail="Invalid token")
-        user = await db.users.find_one({"id": user_id}, {"_id": 0})
+        self.verified[token] = entry
+        if len(self.verified) > self.cache_size:
+            self.verified.popitem(last=False)
+        return entry
+
+    async def authenticate(self, token: str) -> Principal:
+        principal, user_id, jti, issued_at, _ = self.decode(token)
+        if jti in self.revoked:
+            self.rejected += 1
+            raise HTTPException(status_code=401, detail="Token revoked")
+        changed = self.claims_changed.get(user_id)
+        if principal is not None and (changed is None or issued_at > changed[0]):
+            return principal
+        # Claims may be stale (or absent): take them from the user record instead
+        self.lookups += 1
+        user = await user_cache.get(user_id)
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
-        return User(**user)
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+        return Principal(id=user.id, name=user.name, college=user.college)
+
+    async def remaining(self, token: str) -> float:
+        """Seconds until `token` expires, or 0 once it has expired or been
+        revoked. Long-lived streams poll this to close when auth lapses."""
+        try:
+            await self.authenticate(token)
+            exp = self.decode(token)[4]
+        except HTTPException:
+            return 0.0
+        return max(exp - time.time(), 0.0)
+
+    async def refresh(self, refresh_token: str) -> dict:
+        digest = token_digest(refresh_token)
+        now = datetime.now(timezone.utc)
+        doc = await db.refresh_tokens.find_one_and_update(
+            {"_id": digest, "used_at": None, "expires_at": {"$gt": now}},
+            {"$set": {"used_at": now}}
+        )
+        if not doc:
+            spent = await db.refresh_tokens.find_one({"_id": digest}, {"family": 1, "used_at": 1})
+            if spent and spent.get('used_at'):
+                self.reused += 1
+                logger.warning("Refresh token reuse detected; revoking token family %s", spent['family'])
+                await db.refresh_tokens.delete_many({"family": spent['family']})
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        user = await user_cache.get(doc['user_id'])
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        self.refreshed += 1
+        return await self.issue(user, family=doc['family'])
+
+    async def revoke(self, token: str, refresh_token: Optional[str] = None):
+        """Log out: revoke the access token and the refresh token's family."""
+        _, user_id, jti, _, exp = self.decode(token)
+        if jti:
+            self.revoked[jti] = exp
+            await db.token_revocations.update_one(
+                {"_id": jti},
+                {"$set": {"kind": "token", "user_id": user_id, "exp": exp,
+                          "created_at": datetime.now(timezone.utc),
+                          "expires_at": datetime.fromtimestamp(exp, timezone.utc)}},
+                upsert=True
+            )
+        if refresh_token:
+            doc = await db.refresh_tokens.find_one({"_id": token_digest(refresh_token), "user_id": user_id}, {"family": 1})
+            if doc:
+                await db.refresh_tokens.delete_many({"family": doc['family']})
+
+    async def claims_updated(self, user_id: str):
+        """Mark access tokens issued so far for this user as carrying stale claims."""
+        changed_at = time.time()
+        expires = changed_at + ACCESS_TOKEN_TTL
+        self.claims_changed[user_id] = (changed_at, expires)
+        await db.token_revocations.update_one(
+            {"_id": f"claims:{user_id}"},
+            {"$set": {"kind": "claims", "user_id": user_id, "changed_at": changed_at,
+                      "created_at": datetime.now(timezone.utc),
+                      "expires_at": datetime.fromtimestamp(expires, timezone.utc)}},
+            upsert=True
+        )
+
+    async def sync(self):
+        """Pull revocations written by other workers and prune expired entries."""
+        now = datetime.now(timezone.utc)
+        query = {"expires_at": {"$gt": now}}
+        if self.synced_at is not None:
+            # Overlap one interval so writes committed out of order are not missed
+            query["created_at"] = {"$gte": self.synced_at - timedelta(seconds=TOKEN_REVOCATION_SYNC_INTERVAL)}
+        async for doc in db.token_revocations.find(query):
+            if doc['kind'] == 'token':
+                self.revoked[doc['_id']] = doc['exp']
+            else:
+                current = self.claims_changed.get(doc['user_id'])
+                if current is None or current[0] < doc['changed_at']:
+                    self.claims_changed[doc['user_id']] = (doc['changed_at'], doc['changed_at'] + ACCESS_TOKEN_TTL)
+        self.synced_at = now
+        cutoff = time.time()
+        self.revoked = {jti: exp for jti, exp in self.revoked.items() if exp > cutoff}
+        self.claims_changed = {uid: entry for uid, entry in self.claims_changed.items() if entry[1] > cutoff}
+
+    async def sync_loop(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Token revocation sync failed")
+            await asyncio.sleep(TOKEN_REVOCATION_SYNC_INTERVAL)
+
+    def stats(self) -> dict:
+        verifications = self.hits + self.misses
+        return {
+            "cache_size": len(self.verified),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_ratio": round(self.hits / verifications, 4) if verifications else 0.0,
+            "user_lookups": self.lookups,
+            "revoked_tokens": len(self.revoked),
+            "stale_claims": len(self.claims_changed),
+            "rejected": self.rejected,
+            "refreshed": self.refreshed,
+            "refresh_reuse": self.reused,
+        }
+
+token_auth = TokenAuth(TOKEN_CACHE_SIZE)
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    return await token_auth.authenticate(credentials.credentials)
+
+async def get_profile_user(current_user: Principal = Depends(get_current_user)) -> User:
+    user = await user_cache.get(current_user.id)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
+
+async def get_admin_user(current_user: User = Depends(get_profile_user)) -> User:
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+async def get_stream_token(
+    token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> str:
+    """The bearer token, also accepted as ?token= since EventSource and browser
+    WebSockets cannot set an Authorization header."""
+    token = credentials.credentials if credentials else token
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return token
+
+async def get_stream_user(token: str = Depends(get_stream_token)) -> Principal:
+    return await token_auth.authenticate(token)
 
 async def create_notification(user_id: str, message: str, notif_type: str):
     notif = Notification(user_id=user_id, message=message, type=notif_type)
     doc = notif.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.notifications.insert_one(doc)
+    await notification_writer.submit(doc, notif.model_dump(mode='json'))
+
+# ========== RATE LIMITING ==========
+class LocalRateLimitBackend:
+    """Token buckets in process memory, least recently used evicted past
+    max_keys. Shared backends implement the same async take()."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        """Take one token. Returns 0 when allowed, else seconds until a token is free."""
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.buckets[key] = (tokens, now)
+        self.buckets.move_to_end(key)
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return 0.0 if allowed else (1 - tokens) / rate
+
+    def __len__(self):
+        return len(self.buckets)
+
+class MongoRateLimitBackend:
+    """Token buckets in the rate_limits collection, refilled and drawn in one
+    atomic pipeline upsert so all workers share them. Buckets expire through a
+    TTL index once idle long enough to have refilled."""
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        now = time.time()
+        pipeline = [
+            {"$set": {"tokens": {"$min": [capacity, {"$add": [
+                {"$ifNull": ["$tokens", capacity]},
+                {"$multiply": [{"$max": [0, {"$subtract": [now, {"$ifNull": ["$updated", now]}]}]}, rate]},
+            ]}]}}},
+            {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+            {"$set": {
+                "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                "updated": now,
+                "expires_at": datetime.fromtimestamp(now + capacity / rate, timezone.utc),
+            }},
+        ]
+        try:
+            doc = await db.rate_limits.find_one_and_update(
+                {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Two first requests raced to create the bucket; the bucket exists now
+            doc = await db.rate_limits.find_one_and_update(
+                {"_id": key}, pipeline, return_document=ReturnDocument.AFTER
+            )
+        return 0.0 if doc['allowed'] else (1 - doc['tokens']) / rate
+
+def parse_budget(spec: str) -> tuple:
+    requests, _, seconds = spec.partition('/')
+    capacity, period = float(requests), float(seconds)
+    if capacity < 1 or period <= 0:
+        raise ValueError(f"Invalid rate limit {spec!r}")
+    return capacity, capacity / period
+
+class RateLimiter:
+    """Per-route budgets drawn from a bucket backend. Backend failures let the
+    request through rather than turning a limiter outage into a site outage."""
+
+    def __init__(self, backend, budgets: dict):
+        self.backend = backend
+        self.budgets = {
+            route: (*parse_budget(spec), scope)
+            for route, (spec, scope) in budgets.items() if spec != 'off'
+        }
+        self.allowed = 0
+        self.errors = 0
+        self.limited = {route: 0 for route in budgets}
+
+    async def check(self, route: str, key: str):
+        if route not in self.budgets:
+            return
+        capacity, rate, _ = self.budgets[route]
+        try:
+            retry_after = await self.backend.take(f"{route}:{key}", capacity, rate)
+        except Exception:
+            self.errors += 1
+            logger.exception("Rate limit check failed for %s", route)
+            return
+        if retry_after:
+            self.limited[route] += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please retry later",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+        self.allowed += 1
+
+    def stats(self) -> dict:
+        return {
+            "backend": RATE_LIMIT_BACKEND,
+            "buckets": len(self.backend) if hasattr(self.backend, '__len__') else None,
+            "allowed": self.allowed,
+            "errors": self.errors,
+            **{f"limited_{route}": count for route, count in self.limited.items()},
+        }
+
+RATE_LIMIT_BACKENDS = {
+    "local": lambda: LocalRateLimitBackend(RATE_LIMIT_MAX_KEYS),
+    "mongo": MongoRateLimitBackend,
+}
+if RATE_LIMIT_BACKEND not in RATE_LIMIT_BACKENDS:
+    raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND {RATE_LIMIT_BACKEND!r}")
+rate_limiter = RateLimiter(RATE_LIMIT_BACKENDS[RATE_LIMIT_BACKEND](), RATE_LIMITS)
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get('x-forwarded-for')
+        if forwarded:
+            # The last hop is the one our proxy appended; earlier ones are client-supplied
+            return forwarded.split(',')[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+def rate_limit(route: str):
+    """Route dependency drawing one token from the caller's bucket for `route`."""
+    if RATE_LIMITS[route][1] == 'user':
+        async def check_user(current_user: Principal = Depends(get_current_user)):
+            await rate_limiter.check(route, current_user.id)
+        return Depends(check_user)
+
+    async def check_ip(request: Request):
+        await rate_limiter.check(route, client_ip(request))
+    return Depends(check_ip)
+
+class LoadShedder:
+    """Admission state for LoadSheddingMiddleware: counts in-flight requests
+    and decides whether a new one should be turned away."""
+
+    def __init__(self, max_in_flight: int, max_lag: float):
+        self.max_in_flight = max_in_flight
+        self.max_lag = max_lag
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed_in_flight = 0
+        self.shed_lag = 0
+
+    def admit(self) -> bool:
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            self.shed_in_flight += 1
+            return False
+        if self.max_lag and event_loop_monitor.lag >= self.max_lag:
+            self.shed_lag += 1
+            return False
+        self.admitted += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "shed_in_flight": self.shed_in_flight,
+            "shed_event_loop_lag": self.shed_lag,
+        }
+
+load_shedder = LoadShedder(SHED_MAX_IN_FLIGHT, SHED_MAX_EVENT_LOOP_LAG)
+
+# Scrapes, liveness probes and long-lived streams are neither counted nor shed.
+# Readiness is not exempt: an overloaded worker should fail it and drop out of rotation
+SHED_EXEMPT_PATHS = {"/metrics", "/api/health/live", "/api/notifications/stream"}
+
+class LoadSheddingMiddleware:
+    """ASGI middleware answering 503 straight away when the worker is
+    overloaded, so excess requests fail fast instead of queueing behind the
+    event loop and the Mongo pool."""
+
+    def __init__(self, app, shedder: LoadShedder):
+        self.app = app
+        self.shedder = shedder
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in SHED_EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        if not self.shedder.admit():
+            response = JSONResponse(
+                {"detail": "Server overloaded, please retry"}, status_code=503, headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+        self.shedder.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.shedder.in_flight -= 1
+
+# ========== NOTIFICATION WRITER ==========
+class NotificationWriter:
+    """Queues notification inserts and writes them with insert_many from a
+    background task, flushing when a batch fills or the flush interval passes.
+    Documents that fail to insert are requeued up to `retries` times."""
+
+    def __init__(self, batch_size: int, flush_interval: float, queue_limit: int,
+                 retries: int = NOTIFICATION_WRITE_RETRIES, retry_delay: float = NOTIFICATION_RETRY_DELAY):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.queue = asyncio.Queue(maxsize=queue_limit)
+        self.task = None
+        self.written = 0
+        self.failed = 0
+        self.retried = 0
+        self.flushes = 0
+        self.flush_total = 0.0
+        self.flush_max = 0.0
+        self.queued_max = 0.0
+
+    def start(self):
+        # A fresh queue per start: the previous one belongs to an earlier event loop
+        self.queue = asyncio.Queue(maxsize=self.queue.maxsize)
+        self.task = asyncio.create_task(self.run())
+
+    async def submit(self, doc: dict, payload: dict):
+        entry = (doc, payload, time.perf_counter(), 0)
+        if self.task is None:
+            # Writer not running (e.g. outside the app lifecycle): write inline
+            self.failed += len(await self.flush([entry]))
+            return
+        await self.queue.put(entry)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            retry = []
+            try:
+                retry = await self.flush(batch)
+                # Requeued before task_done so drain() keeps waiting for them
+                self.requeue(retry)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if retry:
+                await asyncio.sleep(self.retry_delay)
+
+    async def flush(self, batch: list) -> list:
+        """Insert a batch and publish the documents that were stored. Returns
+        the entries that failed to insert."""
+        started = time.perf_counter()
+        try:
+            await db.notifications.insert_many([entry[0] for entry in batch], ordered=False)
+            failed = set()
+        except BulkWriteError as exc:
+            # Unordered, so everything without a write error was inserted. A
+            # duplicate key means an earlier attempt did store the document.
+            failed = {error['index'] for error in exc.details.get('writeErrors', []) if error.get('code') != 11000}
+            if failed:
+                logger.error("Failed to write %d of %d notifications: %s",
+                             len(failed), len(batch), exc.details['writeErrors'][0].get('errmsg'))
+        except Exception:
+            failed = set(range(len(batch)))
+            logger.exception("Failed to write %d notifications", len(batch))
+        written = [entry for index, entry in enumerate(batch) if index not in failed]
+        if written:
+            finished = time.perf_counter()
+            self.flushes += 1
+            self.written += len(written)
+            self.flush_total += finished - started
+            self.flush_max = max(self.flush_max, finished - started)
+            self.queued_max = max(self.queued_max, started - min(entry[2] for entry in written))
+            if NOTIFICATION_BROKER == 'local':
+                for doc, payload, _, _ in written:
+                    notification_broker.publish(doc['user_id'], payload)
+        return [entry for index, entry in enumerate(batch) if index in failed]
+
+    def requeue(self, entries: list):
+        for doc, payload, queued, attempts in entries:
+            if attempts >= self.retries or self.queue.full():
+                self.failed += 1
+                logger.error("Dropping notification %s after %d attempts", doc['id'], attempts + 1)
+                continue
+            self.retried += 1
+            self.queue.put_nowait((doc, payload, queued, attempts + 1))
+
+    async def drain(self, timeout: float):
+        """Wait for queued notifications to be written, then stop the writer."""
+        if self.task is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error("Dropping %d unwritten notifications at shutdown", self.queue.qsize())
+        self.task.cancel()
+        self.task = None
+
+    def stats(self) -> dict:
+        flushes = self.flushes or 1
+        return {
+            "queue_depth": self.queue.qsize(),
+            "written": self.written,
+            "failed": self.failed,
+            "retried": self.retried,
+            "flushes": self.flushes,
+            "batch_avg": round(self.written / flushes, 2),
+            "flush_avg_ms": round(self.flush_total / flushes * 1000, 3),
+            "flush_max_ms": round(self.flush_max * 1000, 3),
+            "queued_max_ms": round(self.queued_max * 1000, 3),
+        }
+
+notification_writer = NotificationWriter(NOTIFICATION_BATCH_SIZE, NOTIFICATION_FLUSH_INTERVAL, NOTIFICATION_QUEUE_LIMIT)
+
+# ========== NOTIFICATION BROKER ==========
+class NotificationBroker:
+    """Fans new notifications out to the open streams of their recipient."""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.subscribers = {}
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(user_id)
+        if queues:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_id]
+
+    def publish(self, user_id: str, payload: dict):
+        self.published += 1
+        for queue in self.subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # A stalled client loses live events; it still sees them on its next fetch
+                self.dropped += 1
+
+    def stats(self) -> dict:
+        return {
+            "mode": NOTIFICATION_BROKER,
+            "users": len(self.subscribers),
+            "streams": sum(len(q) for q in self.subscribers.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+notification_broker = NotificationBroker(NOTIFICATION_STREAM_QUEUE)
+
+async def notification_change_stream_loop():
+    """Publish inserts seen on the notifications change stream (replica sets only)."""
+    pipeline = [{"$match": {"operationType": "insert"}}]
+    while True:
+        try:
+            async with db.notifications.watch(pipeline) as stream:
+                async for change in stream:
+                    doc = change['fullDocument']
+                    doc.pop('_id', None)
+                    notification_broker.publish(doc['user_id'], Notification(**doc).model_dump(mode='json'))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Notification change stream failed, restarting")
+            await asyncio.sleep(1)
+
+# ========== JOB LEASES ==========
+def worker_id() -> str:
+    # Read on use: with a preloaded app the import happens in the gunicorn master
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class JobLease:
+    """Lease in the leases collection so a periodic job runs on one worker at a
+    time. The holder renews it on every run; if the holder dies, another worker
+    takes over once the lease expires."""
+
+    def __init__(self, name: str, ttl: float):
+        self.name = name
+        self.ttl = ttl
+
+    async def acquire(self) -> bool:
+        now = datetime.now(timezone.utc)
+        try:
+            doc = await db.leases.find_one_and_update(
+                {"_id": self.name, "$or": [{"holder": worker_id()}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"holder": worker_id(), "expires_at": now + timedelta(seconds=self.ttl)}},
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Held by a live worker: the filter missed and the upsert collided
+            doc = None
+        return doc is not None
+
+    async def release(self):
+        # Unconditional: a cancelled acquire may have taken the lease without returning
+        await db.leases.delete_one({"_id": self.name, "holder": worker_id()})
+
+# ========== NOTIFICATION RETENTION ==========
+READ_TTL_INDEX = "notification_read_ttl"
+READ_AT_INDEX = "notification_read_at"
+
+async def ensure_notification_retention():
+    """Set up the read_at index for the configured retention mode, dropping the
+    other mode's index (both share the key, so they cannot coexist)."""
+    if NOTIFICATION_RETENTION not in ('archive', 'ttl', 'off'):
+        raise RuntimeError(f"Unknown NOTIFICATION_RETENTION {NOTIFICATION_RETENTION!r}")
+    ttl = int(NOTIFICATION_READ_RETENTION_DAYS * 86400)
+    indexes = await db.notifications.index_information()
+    keep = {"ttl": READ_TTL_INDEX, "archive": READ_AT_INDEX}.get(NOTIFICATION_RETENTION)
+    for name in (READ_TTL_INDEX, READ_AT_INDEX):
+        if name in indexes and name != keep:
+            try:
+                await db.notifications.drop_index(name)
+            except OperationFailure as exc:
+                if exc.code != 27:  # IndexNotFound: another worker dropped it first
+                    raise
+    if NOTIFICATION_RETENTION == 'ttl':
+        if READ_TTL_INDEX in indexes:
+            if indexes[READ_TTL_INDEX].get('expireAfterSeconds') != ttl:
+                await db.command("collMod", "notifications", index={"name": READ_TTL_INDEX, "expireAfterSeconds": ttl})
+        else:
+            await db.notifications.create_index([("read_at", 1)], name=READ_TTL_INDEX, expireAfterSeconds=ttl)
+    elif NOTIFICATION_RETENTION == 'archive':
+        await db.notifications.create_index([("read_at", 1)], name=READ_AT_INDEX)
+    if NOTIFICATION_RETENTION != 'off':
+        # Notifications read before read_at was recorded start their retention window now
+        await db.notifications.update_many(
+            {"read_at": None, "read": True}, {"$set": {"read_at": datetime.now(timezone.utc)}}
+        )
+
+async def archive_read_notifications() -> int:
+    """Move notifications read more than the retention window ago into
+    notifications_archive, one batch at a time. Returns how many moved."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=NOTIFICATION_READ_RETENTION_DAYS)
+    moved = 0
+    while True:
+        docs = await db.notifications.find({"read_at": {"$lt": cutoff}}) \
+            .limit(NOTIFICATION_ARCHIVE_BATCH_SIZE).to_list(NOTIFICATION_ARCHIVE_BATCH_SIZE)
+        if not docs:
+            return moved
+        try:
+            await db.notifications_archive.insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            # Documents copied by an interrupted run are already archived
+            if any(error['code'] != 11000 for error in exc.details['writeErrors']):
+                raise
+        result = await db.notifications.delete_many({"_id": {"$in": [doc['_id'] for doc in docs]}})
+        moved += result.deleted_count
+
+notification_archive_lease = JobLease("notification_archive", 2 * NOTIFICATION_ARCHIVE_INTERVAL)
+
+async def notification_archive_loop():
+    while True:
+        try:
+            if await notification_archive_lease.acquire():
+                moved = await archive_read_notifications()
+                if moved:
+                    logger.info("Archived %d read notifications", moved)
+        except Exception:
+            logger.exception("Notification archival failed")
+        await asyncio.sleep(NOTIFICATION_ARCHIVE_INTERVAL)
+
+# ========== INDEXES ==========
+PAGE_SORT = [("created_at", -1), ("id", -1)]
+EXPORT_SORT = [("created_at", 1), ("id", 1)]
+
+# Indexes required by the route queries, declared per collection as (keys, options)
+INDEXES = {
+    "users": [
+        ([("id", 1)], {"unique": True}),
+        ([("email", 1)], {"unique": True}),
+        ([("created_at", -1), ("id", -1)], {}),
+    ],
+    "gigs": [
+        ([("id", 1)], {"unique": True}),
+        ([("created_at", -1), ("id", -1)], {}),
+        ([("status", 1), ("created_at", -1), ("id", -1)], {}),
+        ([("status", 1), ("category", 1), ("created_at", -1), ("id", -1)], {}),
+        ([("title", "text"), ("description", "text"), ("category", "text")],
+         {"name": "gig_search", "weights": {"title": 10, "category": 5, "description": 1}}),
+        ([("poster_id", 1), ("created_at", -1), ("id", -1)], {}),
+        ([("acceptor_id", 1), ("created_at", -1), ("id", -1)], {}),
+    ],
+    "services": [
+        ([("id", 1)], {"unique": True}),
+        ([("created_at", -1), ("id", -1)], {}),
+        ([("creator_id", 1), ("created_at", -1), ("id", -1)], {}),
+        ([("title", "text"), ("description", "text")],
+         {"name": "service_search", "weights": {"title": 10, "description": 1}}),
+    ],
+    "orders": [
+        ([("id", 1)], {"unique": True}),
+        ([("buyer_id", 1), ("created_at", -1), ("id", -1)], {}),
+        ([("provider_id", 1), ("created_at", -1), ("id", -1)], {}),
+        ([("gig_id", 1)], {}),
+        ([("created_at", -1), ("id", -1)], {}),
+    ],
+    "ratings": [
+        ([("id", 1)], {"unique": True}),
+        ([("to_user_id", 1), ("created_at", -1), ("id", -1)], {}),
+        ([("order_id", 1), ("from_user_id", 1)], {"unique": True}),
+        # service_id is always written (None when the rating is not for a service),
+        # so only a partial index actually leaves the non-service ratings out
+        ([("service_id", 1)], {"name": "rating_service", "partialFilterExpression": {"service_id": {"$type": "string"}}}),
+        ([("from_user_id", 1)], {}),
+    ],
+    "refresh_tokens": [
+        ([("family", 1)], {}),
+        ([("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ],
+    "rate_limits": [
+        ([("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ],
+    "token_revocations": [
+        ([("created_at", 1)], {}),
+        ([("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ],
+    "notifications": [
+        ([("id", 1)], {"unique": True}),
+        ([("user_id", 1), ("created_at", -1), ("id", -1)], {}),
+        ([("user_id", 1), ("read", 1), ("created_at", -1), ("id", -1)], {}),
+    ],
+}
+
+# Representative query shape for every indexed route: (route, collection, filter, sort)
+QUERY_SHAPES = [
+    ("get_current_user", "users", {"id": ""}, None),
+    ("login", "users", {"email": ""}, None),
+    ("get_gigs", "gigs", {}, PAGE_SORT),
+    ("get_gigs?status", "gigs", {"status": "open"}, PAGE_SORT),
+    ("get_gigs?category", "gigs", {"status": "open", "category": ""}, PAGE_SORT),
+    ("get_gig", "gigs", {"id": ""}, None),
+    ("get_my_gigs", "gigs", {"poster_id": ""}, PAGE_SORT),
+    ("get_my_accepted_gigs", "gigs", {"acceptor_id": ""}, PAGE_SORT),
+    ("get_services", "services", {}, PAGE_SORT),
+    ("get_service", "services", {"id": ""}, None),
+    ("get_my_services", "services", {"creator_id": ""}, PAGE_SORT),
+    ("get_orders", "orders", {"$or": [{"buyer_id": ""}, {"provider_id": ""}]}, PAGE_SORT),
+    ("get_order", "orders", {"id": ""}, None),
+    ("update_gig_status", "orders", {"gig_id": ""}, None),
+    ("create_rating", "ratings", {"order_id": "", "from_user_id": ""}, None),
+    ("get_user_ratings", "ratings", {"to_user_id": ""}, PAGE_SORT),
+    ("get_notifications", "notifications", {"user_id": ""}, PAGE_SORT),
+    ("get_notifications?unread", "notifications", {"user_id": "", "read": False}, PAGE_SORT),
+    ("mark_notifications_read?before", "notifications", {"user_id": "", "read": False, "$or": [
+        {"created_at": {"$lte": datetime(1970, 1, 1, tzinfo=timezone.utc)}},
+        {"created_at": {"$lte": "1970-01-01T00:00:00+00:00"}},
+    ]}, None),
+    ("admin_get_users", "users", {}, PAGE_SORT),
+    ("admin_get_orders", "orders", {}, PAGE_SORT),
+    ("admin_export?since", "orders", {"$or": [
+        {"created_at": {"$gte": datetime(1970, 1, 1, tzinfo=timezone.utc)}},
+        {"created_at": {"$gte": "1970-01-01T00:00:00+00:00"}},
+    ]}, EXPORT_SORT),
+    ("mark_notification_read", "notifications", {"id": ""}, None),
+    ("get_unread_count", "notifications", {"user_id": "", "read": False}, None),
+    ("home:my_active_gigs", "gigs", {"poster_id": "", "status": {"$in": ["open", "accepted"]}}, None),
+    ("home:my_services", "services", {"creator_id": ""}, None),
+]
+
+# Indexes replaced by an entry in INDEXES, dropped on startup by name
+OBSOLETE_INDEXES = {
+    "ratings": ["service_id_1"],
+}
+
+async def ensure_indexes():
+    """Create every declared index. Safe to run on each startup: existing
+    indexes with the same spec are a no-op on the server."""
+    for collection, names in OBSOLETE_INDEXES.items():
+        for name in names:
+            try:
+                await db[collection].drop_index(name)
+            except OperationFailure as exc:
+                if exc.code not in (26, 27):  # NamespaceNotFound / IndexNotFound: nothing to drop
+                    logger.exception("Failed to drop index %s on %s", name, collection)
+    for collection, specs in INDEXES.items():
+        for keys, options in specs:
+            try:
+                await db[collection].create_index(keys, background=True, **options)
+            except Exception:
+                logger.exception("Failed to create index %s on %s", keys, collection)
+
+def _plan_stages(plan: dict):
+    if not plan:
+        return
+    yield plan.get('stage')
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from _plan_stages(child)
+
+async def verify_query_plans() -> List[dict]:
+    """Explain each route query shape and report the winning plan's stages."""
+    results = []
+    for route, collection, query, sort in QUERY_SHAPES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = [s for s in _plan_stages(explain.get('queryPlanner', {}).get('winningPlan', {})) if s]
+        results.append({
+            "route": route,
+            "collection": collection,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return results
+
+# ========== PAGINATION ==========
+def encode_cursor(doc: dict) -> str:
+    created_at = doc['created_at']
+    is_date = isinstance(created_at, datetime)
+    payload = [created_at.isoformat() if is_date else created_at, doc['id'], is_date]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, last_id, is_date = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        # The values go straight into the query, so anything but plain strings
+        # (e.g. an operator document) is rejected
+        if not isinstance(created_at, str) or not isinstance(last_id, str) or not isinstance(is_date, bool):
+            raise ValueError("malformed cursor")
+        return (datetime.fromisoformat(created_at) if is_date else created_at), last_id
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def paginate(collection, query: dict, limit: int, cursor: Optional[str] = None, projection: Optional[dict] = None):
+    """Fetch one page of `collection` newest-first. Returns the raw documents and
+    the cursor for the next page (None on the last page)."""
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        after = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": last_id}},
+        ]
+        if isinstance(created_at, datetime):
+            # Documents not yet migrated still hold ISO strings, which sort after
+            # every BSON date in a descending sort but never match a date $lt
+            after.append({"created_at": {"$type": "string"}})
+        after = {"$or": after}
+        query = {"$and": [query, after]} if query else after
+    docs = await collection.find(query, projection or {"_id": 0}).sort(PAGE_SORT).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+# ========== RATING AGGREGATES ==========
+def add_rating_pipeline(value: float) -> List[dict]:
+    """Update pipeline folding one rating into a document's running sum/count and
+    recomputing its average in a single atomic write. Documents that predate
+    rating_sum seed it from their stored average."""
+    return [
+        {"$set": {
+            "rating_sum": {"$add": [
+                {"$ifNull": ["$rating_sum", {"$multiply": [
+                    {"$ifNull": ["$rating", 0]}, {"$ifNull": ["$rating_count", 0]}
+                ]}]},
+                value,
+            ]},
+            "rating_count": {"$add": [{"$ifNull": ["$rating_count", 0]}, 1]},
+        }},
+        {"$set": {"rating": {"$round": [{"$divide": ["$rating_sum", "$rating_count"]}, 2]}}},
+    ]
+
+def _rollup_ratings_pipeline(group_key: str, into: str, match: Optional[dict] = None) -> List[dict]:
+    pipeline = [{"$match": match}] if match else []
+    return pipeline + [
+        {"$group": {"_id": group_key, "rating_sum": {"$sum": "$rating"}, "rating_count": {"$sum": 1}}},
+        {"$project": {
+            "_id": 0,
+            "id": "$_id",
+            "rating_sum": 1,
+            "rating_count": 1,
+            "rating": {"$round": [{"$divide": ["$rating_sum", "$rating_count"]}, 2]},
+        }},
+        {"$merge": {"into": into, "on": "id", "whenMatched": "merge", "whenNotMatched": "discard"}},
+    ]
+
+async def reconcile_ratings():
+    """Recompute user and service rating totals from the ratings collection."""
+    started = time.perf_counter()
+    await db.ratings.aggregate(_rollup_ratings_pipeline("$to_user_id", "users")).to_list(None)
+    # $merge bypasses user_cache, so drop the cached copy of every rated user
+    async for row in db.ratings.aggregate([{"$group": {"_id": "$to_user_id"}}]):
+        await user_cache.invalidate(row['_id'])
+    await db.ratings.aggregate(
+        _rollup_ratings_pipeline("$service_id", "services", {"service_id": {"$type": "string"}})
+    ).to_list(None)
+    logger.info("Rating reconciliation finished in %.2fs", time.perf_counter() - started)
+
+rating_reconcile_lease = JobLease("rating_reconcile", 2 * RATING_RECONCILE_INTERVAL)
+
+async def rating_reconcile_loop():
+    while True:
+        await asyncio.sleep(RATING_RECONCILE_INTERVAL)
+        try:
+            if await rating_reconcile_lease.acquire():
+                await reconcile_ratings()
+        except Exception:
+            logger.exception("Rating reconciliation failed")
+
+# ========== STATE TRANSITIONS ==========
+# Allowed status changes per collection: current status -> reachable statuses
+GIG_TRANSITIONS = {
+    "open": {"accepted", "cancelled"},
+    "accepted": {"completed", "cancelled"},
+    "completed": set(),
+    "cancelled": set(),
+}
+ORDER_TRANSITIONS = {
+    "active": {"completed", "cancelled"},
+    "completed": set(),
+    "cancelled": set(),
+}
+
+@asynccontextmanager
+async def transaction():
+    """Yield a session with an open transaction, or None when transactions are disabled."""
+    if not MONGO_TRANSACTIONS:
+        yield None
+        return
+    async with await db.client.start_session() as session:
+        async with session.start_transaction():
+            yield session
+
+async def transition(collection, doc_id: str, to_status: str, transitions: dict,
+                     guard: Optional[dict] = None, changes: Optional[dict] = None, session=None):
+    """Move a document to `to_status` in one conditional write. The filter only
+    matches when the current status may reach `to_status` and `guard` holds, so
+    concurrent callers cannot both win. Returns the updated document or None."""
+    from_statuses = [current for current, targets in transitions.items() if to_status in targets]
+    if not from_statuses:
+        return None
+    query = {"id": doc_id, "status": {"$in": from_statuses}, **(guard or {})}
+    return await collection.find_one_and_update(
+        query,
+        {"$set": {"status": to_status, **(changes or {})}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+
+# ========== FEED CACHE ==========
+def _as_utc(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def feed_query(base: dict, category: Optional[str] = None,
+               min_price: Optional[float] = None, max_price: Optional[float] = None) -> dict:
+    query = dict(base)
+    if category:
+        query["category"] = category
+    price = {}
+    if min_price is not None:
+        price["$gte"] = min_price
+    if max_price is not None:
+        price["$lte"] = max_price
+    if price:
+        query["price"] = price
+    return query
+
+def render_page(items: List[dict], next_cursor: Optional[str]):
+    """Serialize a page once and return it with its ETag."""
+    body = orjson.dumps({"items": items, "next_cursor": next_cursor})
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"', body
+
+def etag_response(request: Request, etag: str, body: bytes) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get('if-none-match', '')
+    candidates = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    if etag in candidates or '*' in candidates:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+class FeedCache:
+    """Snapshot of the newest FEED_SNAPSHOT_LIMIT documents of a public feed.
+    Filtered pages are cut from the snapshot and kept as pre-rendered JSON until
+    a write invalidates the feed or the TTL lapses. Pages the snapshot cannot
+    answer (it was truncated and the page runs past its end) go to Mongo."""
+
+    def __init__(self, collection: str, base_query: dict, model, ttl: float, snapshot_limit: int, max_pages: int):
+        self.collection = collection
+        self.base_query = base_query
+        self.model = model
+        self.ttl = ttl
+        self.snapshot_limit = snapshot_limit
+        self.max_pages = max_pages
+        self.items = None
+        self.truncated = False
+        self.loaded_at = 0.0
+        self.version = 0
+        self.pages = OrderedDict()
+        self.lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self.loads = 0
+
+    def invalidate(self):
+        self.version += 1
+        self.items = None
+        self.pages.clear()
+
+    def fresh(self) -> bool:
+        return self.items is not None and time.monotonic() - self.loaded_at < self.ttl
+
+    async def load(self):
+        async with self.lock:
+            if self.fresh():
+                return
+            version = self.version
+            docs = await db.reads('feeds')[self.collection].find(self.base_query, {"_id": 0}).sort(PAGE_SORT) \
+                .limit(self.snapshot_limit + 1).to_list(self.snapshot_limit + 1)
+            items = []
+            for doc in docs[:self.snapshot_limit]:
+                model = self.model(**doc)
+                items.append((_as_utc(model.created_at), model.id, model.model_dump(mode='json')))
+            items.sort(key=lambda item: (item[0], item[1]), reverse=True)
+            self.loads += 1
+            if version != self.version:
+                return  # a write landed while loading; the next request reloads
+            self.items = items
+            self.truncated = len(docs) > self.snapshot_limit
+            self.loaded_at = time.monotonic()
+            self.pages.clear()
+
+    async def page(self, limit: int, cursor: Optional[str], **filters):
+        """Return (etag, body) for one page of the feed."""
+        key = (limit, cursor, tuple(sorted(filters.items())))
+        if self.fresh() and key in self.pages:
+            self.hits += 1
+            self.pages.move_to_end(key)
+            return self.pages[key]
+        self.misses += 1
+        if not self.fresh():
+            await self.load()
+        items = self.items
+        if items is None:
+            return await self.fetch(limit, cursor, **filters)
+        after = None
+        if cursor:
+            created_at, last_id = decode_cursor(cursor)
+            after = (_as_utc(created_at), last_id)
+        matched = []
+        for created_at, item_id, item in items:
+            if after and (created_at, item_id) >= after:
+                continue
+            if filters.get('category') and item.get('category') != filters['category']:
+                continue
+            if filters.get('min_price') is not None and item['price'] < filters['min_price']:
+                continue
+            if filters.get('max_price') is not None and item['price'] > filters['max_price']:
+                continue
+            matched.append((created_at, item_id, item))
+            if len(matched) > limit:
+                break
+        if len(matched) <= limit and self.truncated:
+            return await self.fetch(limit, cursor, **filters)
+        next_cursor = None
+        if len(matched) > limit:
+            created_at, item_id, _ = matched[limit - 1]
+            next_cursor = encode_cursor({"created_at": created_at, "id": item_id})
+        rendered = render_page([item for _, _, item in matched[:limit]], next_cursor)
+        self.pages[key] = rendered
+        while len(self.pages) > self.max_pages:
+            self.pages.popitem(last=False)
+        return rendered
+
+    async def head(self, limit: int) -> dict:
+        """The newest `limit` items with the feed's total count and the cursor
+        for the next page, from the snapshot when it holds the whole feed."""
+        if not self.fresh():
+            await self.load()
+        items = self.items
+        if items is not None and not self.truncated:
+            next_cursor = None
+            if len(items) > limit:
+                created_at, item_id, _ = items[limit - 1]
+                next_cursor = encode_cursor({"created_at": created_at, "id": item_id})
+            return {"items": [item for _, _, item in items[:limit]], "count": len(items), "next_cursor": next_cursor}
+        collection = db.reads('feeds')[self.collection]
+        (docs, next_cursor), count = await asyncio.gather(
+            paginate(collection, self.base_query, limit),
+            collection.count_documents(self.base_query)
+        )
+        items = [self.model(**doc).model_dump(mode='json') for doc in docs]
+        return {"items": items, "count": count, "next_cursor": next_cursor}
+
+    async def fetch(self, limit: int, cursor: Optional[str], **filters):
+        self.fallbacks += 1
+        docs, next_cursor = await paginate(db.reads('feeds')[self.collection], feed_query(self.base_query, **filters), limit, cursor)
+        return render_page([self.model(**doc).model_dump(mode='json') for doc in docs], next_cursor)
+
+    def stats(self) -> dict:
+        return {
+            "snapshot_size": len(self.items) if self.items is not None else None,
+            "truncated": self.truncated,
+            "cached_pages": len(self.pages),
+            "hits": self.hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks,
+            "loads": self.loads,
+            "invalidations": self.version,
+        }
+
+open_gig_feed = FeedCache("gigs", {"status": "open"}, Gig, FEED_CACHE_TTL, FEED_SNAPSHOT_LIMIT, FEED_CACHE_PAGES)
+service_feed = FeedCache("services", {}, Service, FEED_CACHE_TTL, FEED_SNAPSHOT_LIMIT, FEED_CACHE_PAGES)
+
+# ========== SEARCH ==========
+def encode_offset_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode('utf-8')).decode('ascii')
+
+def decode_offset_cursor(cursor: str) -> int:
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))['offset']
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Search results stop at SEARCH_MAX_RESULTS, so no valid cursor points past them
+    if not isinstance(offset, int) or isinstance(offset, bool) or not 0 <= offset < SEARCH_MAX_RESULTS:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return offset
+
+async def search_collection(collection: str, model, kind: str, query: dict, facets: dict, skip: int, limit: int):
+    """Run a $text query and its facet counts in one aggregation. Returns the
+    ranked items (with their relevance score), the total match count and facets."""
+    pipeline = [
+        {"$match": query},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+        {"$facet": {
+            "results": [
+                {"$sort": {"score": -1, "created_at": -1, "id": -1}},
+                {"$skip": skip},
+                {"$limit": limit},
+                {"$project": {"_id": 0}},
+            ],
+            "total": [{"$count": "count"}],
+            **facets,
+        }},
+    ]
+    [result] = await db.reads('search')[collection].aggregate(pipeline).to_list(1)
+    items = [
+        {"type": kind, "score": round(doc['score'], 4), **model(**doc).model_dump(mode='json')}
+        for doc in result.pop('results')
+    ]
+    total = result.pop('total')
+    return items, (total[0]['count'] if total else 0), {
+        name: [{"value": bucket['_id'], "count": bucket['count']} for bucket in buckets]
+        for name, buckets in result.items()
+    }
+
+# ========== ADMIN STATS ==========
+def _daily_rollup_pipeline(since: Optional[datetime], group: dict) -> List[dict]:
+    day = {"$dateToString": {
+        "format": "%Y-%m-%d",
+        "date": {"$convert": {"input": "$created_at", "to": "date", "onError": None, "onNull": None}},
+    }}
+    pipeline = [{"$match": {"created_at": {"$gte": since}}}] if since else []
+    return pipeline + [
+        {"$group": {"_id": day, **group}},
+        {"$match": {"_id": {"$ne": None}}},
+        {"$merge": {"into": "admin_stats_daily", "on": "_id", "whenMatched": "merge", "whenNotMatched": "insert"}},
+    ]
+
+def _not_cancelled(field: str) -> dict:
+    return {"$sum": {"$cond": [{"$ne": ["$status", "cancelled"]}, field, 0]}}
+
+async def refresh_admin_stats(lookback_days: Optional[int] = ADMIN_STATS_LOOKBACK_DAYS):
+    """Rebuild the summary rollup and the daily buckets of the last
+    `lookback_days` days (all days when None)."""
+    started = time.perf_counter()
+    since = None
+    if lookback_days is not None:
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        since = today - timedelta(days=lookback_days)
+    await asyncio.gather(
+        db.orders.aggregate(_daily_rollup_pipeline(since, {
+            "orders": {"$sum": 1},
+            "completed": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}},
+            "cancelled": {"$sum": {"$cond": [{"$eq": ["$status", "cancelled"]}, 1, 0]}},
+            "gmv": _not_cancelled("$total_amount"),
+            "commission": _not_cancelled("$commission"),
+        })).to_list(None),
+        db.users.aggregate(_daily_rollup_pipeline(since, {"new_users": {"$sum": 1}})).to_list(None),
+        db.gigs.aggregate(_daily_rollup_pipeline(since, {"new_gigs": {"$sum": 1}})).to_list(None),
+        db.services.aggregate(_daily_rollup_pipeline(since, {"new_services": {"$sum": 1}})).to_list(None),
+    )
+    users, services, gigs_by_status, orders_by_status = await asyncio.gather(
+        db.users.estimated_document_count(),
+        db.services.estimated_document_count(),
+        db.gigs.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]).to_list(None),
+        db.orders.aggregate([{"$group": {
+            "_id": "$status",
+            "count": {"$sum": 1},
+            "amount": {"$sum": "$total_amount"},
+            "commission": {"$sum": "$commission"},
+        }}]).to_list(None),
+    )
+    await db.admin_stats.replace_one({"_id": "summary"}, {
+        "users": users,
+        "services": services,
+        "gigs_by_status": {row['_id']: row['count'] for row in gigs_by_status},
+        "orders_by_status": {
+            row['_id']: {"count": row['count'], "amount": row['amount'], "commission": row['commission']}
+            for row in orders_by_status
+        },
+        "refreshed_at": datetime.now(timezone.utc),
+    }, upsert=True)
+    logger.info("Admin stats refreshed in %.2fs", time.perf_counter() - started)
+
+admin_stats_lease = JobLease("admin_stats", 2 * ADMIN_STATS_REFRESH_INTERVAL)
+
+async def admin_stats_loop():
+    while True:
+        try:
+            if await admin_stats_lease.acquire():
+                summary = await db.admin_stats.find_one({"_id": "summary"}, {"_id": 1})
+                await refresh_admin_stats(ADMIN_STATS_LOOKBACK_DAYS if summary else None)
+        except Exception:
+            logger.exception("Admin stats refresh failed")
+        await asyncio.sleep(ADMIN_STATS_REFRESH_INTERVAL)
+
+# ========== NAME FAN-OUT ==========
+# Denormalized copies of a user's name as (collection, user id field, name field)
+NAME_FIELDS = [
+    ("gigs", "poster_id", "poster_name"),
+    ("gigs", "acceptor_id", "acceptor_name"),
+    ("services", "creator_id", "creator_name"),
+    ("orders", "buyer_id", "buyer_name"),
+    ("orders", "provider_id", "provider_name"),
+    ("ratings", "from_user_id", "from_user_name"),
+    ("ratings", "to_user_id", "to_user_name"),
+]
+
+class NameFanout:
+    """Copies a user's current name into every denormalized name field. Jobs
+    are recorded in `name_fanout` before they are queued, so a restart resumes
+    them, and repeated renames of one user collapse into a single pass that
+    writes whatever name the user has when it runs."""
+
+    def __init__(self, batch_size: int, batch_delay: float):
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.queue = asyncio.Queue()
+        self.queued = set()
+        self.jobs = 0
+        self.updated = 0
+        self.failed = 0
+
+    async def submit(self, user_id: str):
+        await db.name_fanout.update_one(
+            {"_id": user_id}, {"$set": {"queued_at": datetime.now(timezone.utc)}}, upsert=True
+        )
+        self.enqueue(user_id)
+
+    def enqueue(self, user_id: str):
+        if user_id not in self.queued:
+            self.queued.add(user_id)
+            self.queue.put_nowait(user_id)
+
+    async def run(self):
+        # Anything queued by an earlier run is still recorded in name_fanout
+        self.queue = asyncio.Queue()
+        self.queued.clear()
+        try:
+            async for job in db.name_fanout.find({}, {"_id": 1}):
+                self.enqueue(job['_id'])
+        except Exception:
+            logger.exception("Failed to resume pending name fan-out jobs")
+        while True:
+            user_id = await self.queue.get()
+            self.queued.discard(user_id)
+            try:
+                await self.fan_out(user_id)
+            except Exception:
+                # The job record stays, so the next start or rename retries it
+                self.failed += 1
+                logger.exception("Name fan-out failed for user %s", user_id)
+
+    async def fan_out(self, user_id: str):
+        started = datetime.now(timezone.utc)
+        user = await db.users.find_one({"id": user_id}, {"_id": 0, "name": 1})
+        if user:
+            for collection, id_field, name_field in NAME_FIELDS:
+                while True:
+                    stale = await db[collection].find(
+                        {id_field: user_id, name_field: {"$ne": user['name']}}, {"_id": 1}
+                    ).limit(self.batch_size).to_list(self.batch_size)
+                    if not stale:
+                        break
+                    result = await db[collection].bulk_write([
+                        UpdateOne({"_id": doc['_id'], id_field: user_id}, {"$set": {name_field: user['name']}})
+                        for doc in stale
+                    ], ordered=False)
+                    self.updated += result.modified_count
+                    if collection == 'gigs':
+                        open_gig_feed.invalidate()
+                    elif collection == 'services':
+                        service_feed.invalidate()
+                    await asyncio.sleep(self.batch_delay)
+        # A rename recorded after this pass started keeps its job for the next pass
+        await db.name_fanout.delete_one({"_id": user_id, "queued_at": {"$lte": started}})
+        self.jobs += 1
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "jobs": self.jobs,
+            "updated": self.updated,
+            "failed": self.failed,
+        }
+
+name_fanout = NameFanout(NAME_FANOUT_BATCH_SIZE, NAME_FANOUT_BATCH_DELAY)
+
+# ========== SCREENS ==========
+async def screen_slice(lean: LeanModel, collection, query: dict, limit: int) -> dict:
+    """First page of a list with its total count, fetched concurrently."""
+    (docs, next_cursor), count = await asyncio.gather(
+        paginate(collection, query, limit, None, lean.projection),
+        collection.count_documents(query)
+    )
+    return {"items": lean.items(docs), "count": count, "next_cursor": next_cursor}
+
+async def screen_count(collection, query: dict) -> dict:
+    return {"count": await collection.count_documents(query)}
+
+def user_orders_query(user_id: str) -> dict:
+    return {"$or": [{"buyer_id": user_id}, {"provider_id": user_id}]}
+
+# ========== BLOB STORE ==========
+BLOB_KEY = re.compile(r'^[0-9a-f]{64}$')
+
+class LocalBlobStore:
+    """Blobs as files under `root`, fanned out by key prefix. Writes go through
+    a temporary file and a rename, so readers never see a partial blob."""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    async def put(self, key: str, data: bytes, content_type: str) -> bool:
+        """Store `data` under `key`; returns False when it was already stored."""
+        return await asyncio.to_thread(self._put, key, data, content_type)
+
+    def _put(self, key: str, data: bytes, content_type: str) -> bool:
+        path = self.path(key)
+        if path.exists():
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.with_suffix('.type').write_text(content_type)
+        tmp = path.with_name(f"{key}.{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        return True
+
+    async def get(self, key: str):
+        """Return (data, content_type), or None when the key is unknown."""
+        return await asyncio.to_thread(self._get, key)
+
+    def _get(self, key: str):
+        path = self.path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        type_path = path.with_suffix('.type')
+        return data, type_path.read_text() if type_path.exists() else "application/octet-stream"
+
+class GridFSBlobStore:
+    """Blobs in a GridFS bucket with the content key as the file _id, so
+    concurrent uploads of the same content collapse onto one file."""
+
+    def __init__(self, bucket_name: str):
+        self.bucket_name = bucket_name
+
+    def bucket(self):
+        return AsyncIOMotorGridFSBucket(db.database, bucket_name=self.bucket_name)
+
+    async def exists(self, key: str) -> bool:
+        return await db[f"{self.bucket_name}.files"].find_one({"_id": key}, {"_id": 1}) is not None
+
+    async def put(self, key: str, data: bytes, content_type: str) -> bool:
+        for attempt in range(3):
+            if await self.exists(key):
+                return False
+            try:
+                await self.bucket().upload_from_stream_with_id(key, key, data, metadata={"content_type": content_type})
+                return True
+            except gridfs.errors.FileExists:
+                # Another upload of the same content got there first. If it
+                # finished we are done; if both writers collided on different
+                # chunks neither wrote the files document, so clear the
+                # leftover chunks and store the (identical) content again.
+                if await self.exists(key):
+                    return False
+                if attempt == 2:
+                    raise
+                await db[f"{self.bucket_name}.chunks"].delete_many({"files_id": key})
+
+    async def get(self, key: str):
+        try:
+            stream = await self.bucket().open_download_stream(key)
+        except gridfs.errors.NoFile:
+            return None
+        return await stream.read(), (stream.metadata or {}).get('content_type', "application/octet-stream")
+
+blob_store = LocalBlobStore(BLOB_DIR) if BLOB_STORE == 'local' else GridFSBlobStore("pictures")
+
+def process_picture(data: bytes) -> bytes:
+    """Decode an uploaded image, apply its EXIF orientation and re-encode it as a
+    JPEG no larger than PICTURE_MAX_DIMENSION on either side. CPU bound."""
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > PICTURE_MAX_PIXELS:
+            raise HTTPException(status_code=400, detail="Image dimensions too large")
+        image.draft('RGB', (PICTURE_MAX_DIMENSION, PICTURE_MAX_DIMENSION))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((PICTURE_MAX_DIMENSION, PICTURE_MAX_DIMENSION))
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise HTTPException(status_code=400, detail="Unsupported image")
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    out = io.BytesIO()
+    image.save(out, format='JPEG', quality=PICTURE_QUALITY, optimize=True, progressive=True)
+    return out.getvalue()
+
+async def store_picture(data: bytes) -> str:
+    """Process and store a picture, returning the URL path to save on the user."""
+    processed = await asyncio.get_running_loop().run_in_executor(None, process_picture, data)
+    key = hashlib.sha256(processed).hexdigest()
+    await blob_store.put(key, processed, "image/jpeg")
+    return f"/api/pictures/{key}"
+
+def parse_range(header: str, size: int):
+    """Return the inclusive (start, end) of a single `bytes=` range, or None to
+    serve the whole body. Multi-range requests get the whole body too."""
+    units, _, spec = header.partition('=')
+    if units.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        else:
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+# ========== EXPORTS ==========
+EXPORTS = {
+    "users": (User, {"_id": 0, "password_hash": 0}),
+    "gigs": (Gig, {"_id": 0}),
+    "services": (Service, {"_id": 0}),
+    "orders": (Order, {"_id": 0}),
+}
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+async def export_rows(collection: str, fmt: str, since: Optional[datetime] = None):
+    """Yield a collection export oldest-first, one chunk per cursor batch, so
+    memory stays flat however many documents match. `since` is inclusive;
+    incremental consumers pass the last created_at they saw and drop repeats by id."""
+    model, projection = EXPORTS[collection]
+    query = {}
+    if since:
+        # Unmigrated documents still hold ISO strings, which a date $gte never matches
+        query = {"$or": [{"created_at": {"$gte": since}}, {"created_at": {"$gte": since.isoformat()}}]}
+    cursor = db.reads('admin')[collection].find(query, projection).sort(EXPORT_SORT).batch_size(EXPORT_BATCH_SIZE)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(model.model_fields))
+    if fmt == 'csv':
+        writer.writeheader()
+    rows = 0
+    try:
+        async for doc in cursor:
+            item = model(**doc)
+            if fmt == 'csv':
+                writer.writerow({key: _csv_value(value) for key, value in item.model_dump(mode='json').items()})
+            else:
+                buffer.write(item.model_dump_json())
+                buffer.write("\n")
+            rows += 1
+            if rows % EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    except Exception:
+        # Headers are already sent, so the client only sees a truncated body
+        logger.exception("Export of %s failed after %d rows", collection, rows)
+        raise
+    finally:
+        await cursor.close()
 
 # ========== AUTH ROUTES ==========
-@api_router.post("/auth/signup")
+@api_router.post("/auth/signup", dependencies=[rate_limit("signup")])
 async def signup(user_data: UserCreate):
     if not user_data.terms_accepted:
         raise HTTPException(status_code=400, detail="Must accept terms and conditions")
@@ -192,7 +2452,7 @@ async def signup(user_data: UserCreate):
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    password_hash = hash_password(user_data.password)
+    password_hash = await password_pool.run(hash_password, user_data.password)
     user = User(
         name=user_data.name,
         email=user_data.email,
@@ -203,102 +2463,159 @@ async def signup(user_data: UserCreate):
     
     doc = user.model_dump()
     doc['password_hash'] = password_hash
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.users.insert_one(doc)
+    try:
+        await db.users.insert_one(doc)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent signup for the same email
+        raise HTTPException(status_code=400, detail="Email already registered")
     
-    token = create_token(user.id)
-    return {"token": token, "user": user}
+    return {**await token_auth.issue(user), "user": user}
 
-@api_router.post("/auth/login")
+@api_router.post("/auth/login", dependencies=[rate_limit("login")])
 async def login(login_data: UserLogin):
     user_doc = await db.users.find_one({"email": login_data.email}, {"_id": 0})
     if not user_doc:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not verify_password(login_data.password, user_doc.get('password_hash', '')):
+    if not await password_pool.run(verify_password, login_data.password, user_doc.get('password_hash', '')):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     user = User(**user_doc)
-    token = create_token(user.id)
-    return {"token": token, "user": user}
+    return {**await token_auth.issue(user), "user": user}
+
+@api_router.post("/auth/refresh")
+async def refresh_token(refresh_data: TokenRefresh):
+    return await token_auth.refresh(refresh_data.refresh_token)
+
+@api_router.post("/auth/logout")
+async def logout(refresh_data: Optional[TokenRefresh] = None, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    await token_auth.revoke(credentials.credentials, refresh_data.refresh_token if refresh_data else None)
+    return {"message": "Logged out"}
 
 @api_router.get("/auth/me", response_model=User)
-async def get_me(current_user: User = Depends(get_current_user)):
-    return current_user
+async def get_me(current_user: User = Depends(get_profile_user)):
+    return lean_user.instance(current_user)
 
 # ========== USER ROUTES ==========
 @api_router.get("/users/{user_id}", response_model=User)
 async def get_user(user_id: str):
-    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
+    user = await db.users.find_one({"id": user_id}, lean_user.projection)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return User(**user)
+    return lean_user.one(user)
 
 @api_router.put("/users/profile", response_model=User)
-async def update_profile(update_data: UserUpdate, current_user: User = Depends(get_current_user)):
+async def update_profile(update_data: UserUpdate, current_user: Principal = Depends(get_current_user)):
     update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
+    if update_dict.get('picture', '').startswith('data:'):
+        raise HTTPException(status_code=400, detail="Upload pictures through /api/users/picture")
     if update_dict:
         await db.users.update_one({"id": current_user.id}, {"$set": update_dict})
-    updated_user = await db.users.find_one({"id": current_user.id}, {"_id": 0, "password_hash": 0})
-    return User(**updated_user)
+        await user_cache.invalidate(current_user.id)
+        if any(update_dict.get(field, getattr(current_user, field)) != getattr(current_user, field) for field in ('name', 'college')):
+            await token_auth.claims_updated(current_user.id)
+        if update_dict.get('name', current_user.name) != current_user.name:
+            await name_fanout.submit(current_user.id)
+    updated_user = await db.users.find_one({"id": current_user.id}, lean_user.projection)
+    return lean_user.one(updated_user)
+
+@api_router.post("/users/picture", response_model=User)
+async def upload_picture(file: UploadFile = File(...), current_user: Principal = Depends(get_current_user)):
+    data = await file.read(PICTURE_MAX_BYTES + 1)
+    if len(data) > PICTURE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Image too large")
+    picture = await store_picture(data)
+    await db.users.update_one({"id": current_user.id}, {"$set": {"picture": picture}})
+    await user_cache.invalidate(current_user.id)
+    updated_user = await db.users.find_one({"id": current_user.id}, lean_user.projection)
+    return lean_user.one(updated_user)
+
+@api_router.get("/pictures/{key}")
+async def get_picture(key: str, request: Request):
+    blob = await blob_store.get(key) if BLOB_KEY.match(key) else None
+    if blob is None:
+        raise HTTPException(status_code=404, detail="Picture not found")
+    data, content_type = blob
+    # Keys are content hashes, so a URL's bytes never change
+    headers = {
+        "ETag": f'"{key}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if f'"{key}"' in request.headers.get('if-none-match', ''):
+        return Response(status_code=304, headers=headers)
+    byte_range = parse_range(request.headers['range'], len(data)) if 'range' in request.headers else None
+    if byte_range is None:
+        return Response(content=data, media_type=content_type, headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+    return Response(content=data[start:end + 1], status_code=206, media_type=content_type, headers=headers)
 
 # ========== GIG ROUTES ==========
-@api_router.post("/gigs", response_model=Gig)
-async def create_gig(gig_data: GigCreate, current_user: User = Depends(get_current_user)):
+@api_router.post("/gigs", response_model=Gig, dependencies=[rate_limit("create_gig")])
+async def create_gig(gig_data: GigCreate, current_user: Principal = Depends(get_current_user)):
     gig = Gig(**gig_data.model_dump(), poster_id=current_user.id, poster_name=current_user.name)
     doc = gig.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.gigs.insert_one(doc)
-    return gig
+    open_gig_feed.invalidate()
+    return lean_gig.instance(gig)
 
-@api_router.get("/gigs", response_model=List[Gig])
-async def get_gigs(status: Optional[str] = None):
-    query = {} if not status else {"status": status}
-    gigs = await db.gigs.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    for gig in gigs:
-        if isinstance(gig['created_at'], str):
-            gig['created_at'] = datetime.fromisoformat(gig['created_at'])
-    return gigs
+@api_router.get("/gigs", response_model=Page[Gig])
+async def get_gigs(
+    request: Request,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None
+):
+    if status == 'open':
+        etag, body = await open_gig_feed.page(limit, cursor, category=category, min_price=min_price, max_price=max_price)
+        return etag_response(request, etag, body)
+    query = feed_query({} if not status else {"status": status}, category, min_price, max_price)
+    gigs, next_cursor = await paginate(db.gigs, query, limit, cursor, lean_gig.projection)
+    return lean_gig.page(gigs, next_cursor)
 
 @api_router.get("/gigs/{gig_id}", response_model=Gig)
 async def get_gig(gig_id: str):
-    gig = await db.gigs.find_one({"id": gig_id}, {"_id": 0})
+    gig = await db.gigs.find_one({"id": gig_id}, lean_gig.projection)
     if not gig:
         raise HTTPException(status_code=404, detail="Gig not found")
-    if isinstance(gig['created_at'], str):
-        gig['created_at'] = datetime.fromisoformat(gig['created_at'])
-    return Gig(**gig)
+    return lean_gig.one(gig)
 
 @api_router.post("/gigs/{gig_id}/accept")
-async def accept_gig(gig_id: str, current_user: User = Depends(get_current_user)):
-    gig = await db.gigs.find_one({"id": gig_id}, {"_id": 0})
-    if not gig:
-        raise HTTPException(status_code=404, detail="Gig not found")
-    if gig['status'] != 'open':
-        raise HTTPException(status_code=400, detail="Gig not available")
-    if gig['poster_id'] == current_user.id:
-        raise HTTPException(status_code=400, detail="Cannot accept your own gig")
-    
-    await db.gigs.update_one(
-        {"id": gig_id},
-        {"$set": {"status": "accepted", "acceptor_id": current_user.id, "acceptor_name": current_user.name}}
-    )
-    
-    # Create order
-    commission = gig['price'] * 0.15
-    order = Order(
-        order_type="gig",
-        gig_id=gig_id,
-        buyer_id=gig['poster_id'],
-        buyer_name=gig['poster_name'],
-        provider_id=current_user.id,
-        provider_name=current_user.name,
-        total_amount=gig['price'],
-        commission=commission
-    )
-    order_doc = order.model_dump()
-    order_doc['created_at'] = order_doc['created_at'].isoformat()
-    await db.orders.insert_one(order_doc)
+async def accept_gig(gig_id: str, current_user: Principal = Depends(get_current_user)):
+    async with transaction() as session:
+        gig = await transition(
+            db.gigs, gig_id, "accepted", GIG_TRANSITIONS,
+            guard={"poster_id": {"$ne": current_user.id}},
+            changes={"acceptor_id": current_user.id, "acceptor_name": current_user.name},
+            session=session
+        )
+        if not gig:
+            existing = await db.gigs.find_one({"id": gig_id}, {"_id": 0, "poster_id": 1}, session=session)
+            if not existing:
+                raise HTTPException(status_code=404, detail="Gig not found")
+            if existing['poster_id'] == current_user.id:
+                raise HTTPException(status_code=400, detail="Cannot accept your own gig")
+            raise HTTPException(status_code=400, detail="Gig not available")
+        
+        # Create order
+        commission = gig['price'] * 0.15
+        order = Order(
+            order_type="gig",
+            gig_id=gig_id,
+            buyer_id=gig['poster_id'],
+            buyer_name=gig['poster_name'],
+            provider_id=current_user.id,
+            provider_name=current_user.name,
+            total_amount=gig['price'],
+            commission=commission
+        )
+        order_doc = order.model_dump()
+        await db.orders.insert_one(order_doc, session=session)
+    open_gig_feed.invalidate()
     
     # Notify poster
     await create_notification(
@@ -310,75 +2627,81 @@ async def accept_gig(gig_id: str, current_user: User = Depends(get_current_user)
     return {"message": "Gig accepted", "order_id": order.id}
 
 @api_router.put("/gigs/{gig_id}/status", response_model=Gig)
-async def update_gig_status(gig_id: str, status_data: GigUpdateStatus, current_user: User = Depends(get_current_user)):
-    gig = await db.gigs.find_one({"id": gig_id}, {"_id": 0})
-    if not gig:
-        raise HTTPException(status_code=404, detail="Gig not found")
-    
-    if gig['poster_id'] != current_user.id and gig.get('acceptor_id') != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    await db.gigs.update_one({"id": gig_id}, {"$set": {"status": status_data.status}})
+async def update_gig_status(gig_id: str, status_data: GigUpdateStatus, current_user: Principal = Depends(get_current_user)):
+    async with transaction() as session:
+        gig = await transition(
+            db.gigs, gig_id, status_data.status, GIG_TRANSITIONS,
+            guard={"$or": [{"poster_id": current_user.id}, {"acceptor_id": current_user.id}]},
+            session=session
+        )
+        if not gig:
+            existing = await db.gigs.find_one({"id": gig_id}, {"_id": 0}, session=session)
+            if not existing:
+                raise HTTPException(status_code=404, detail="Gig not found")
+            if existing['poster_id'] != current_user.id and existing.get('acceptor_id') != current_user.id:
+                raise HTTPException(status_code=403, detail="Not authorized")
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot change gig status from {existing['status']} to {status_data.status}"
+            )
+        
+        # Update order status if completed or cancelled
+        if status_data.status in ['completed', 'cancelled']:
+            await db.orders.update_one(
+                {"gig_id": gig_id, "status": "active"},
+                {"$set": {"status": status_data.status}},
+                session=session
+            )
+    open_gig_feed.invalidate()
     
-    # Update order status if completed or cancelled
     if status_data.status in ['completed', 'cancelled']:
-        await db.orders.update_one({"gig_id": gig_id}, {"$set": {"status": status_data.status}})
-        
         # Notify participants
         if gig.get('acceptor_id'):
             msg = f"Gig '{gig['title']}' has been {status_data.status}"
             await create_notification(gig['acceptor_id'], msg, status_data.status)
         await create_notification(gig['poster_id'], f"Your gig '{gig['title']}' has been {status_data.status}", status_data.status)
     
-    updated_gig = await db.gigs.find_one({"id": gig_id}, {"_id": 0})
-    if isinstance(updated_gig['created_at'], str):
-        updated_gig['created_at'] = datetime.fromisoformat(updated_gig['created_at'])
-    return Gig(**updated_gig)
-
-@api_router.get("/gigs/my/posted", response_model=List[Gig])
-async def get_my_gigs(current_user: User = Depends(get_current_user)):
-    gigs = await db.gigs.find({"poster_id": current_user.id}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    for gig in gigs:
-        if isinstance(gig['created_at'], str):
-            gig['created_at'] = datetime.fromisoformat(gig['created_at'])
-    return gigs
-
-@api_router.get("/gigs/my/accepted", response_model=List[Gig])
-async def get_my_accepted_gigs(current_user: User = Depends(get_current_user)):
-    gigs = await db.gigs.find({"acceptor_id": current_user.id}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    for gig in gigs:
-        if isinstance(gig['created_at'], str):
-            gig['created_at'] = datetime.fromisoformat(gig['created_at'])
-    return gigs
+    return Gig(**gig)
+
+@api_router.get("/gigs/my/posted", response_model=Page[Gig])
+async def get_my_gigs(limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX), cursor: Optional[str] = None, current_user: Principal = Depends(get_current_user)):
+    gigs, next_cursor = await paginate(db.gigs, {"poster_id": current_user.id}, limit, cursor, lean_gig.projection)
+    return lean_gig.page(gigs, next_cursor)
+
+@api_router.get("/gigs/my/accepted", response_model=Page[Gig])
+async def get_my_accepted_gigs(limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX), cursor: Optional[str] = None, current_user: Principal = Depends(get_current_user)):
+    gigs, next_cursor = await paginate(db.gigs, {"acceptor_id": current_user.id}, limit, cursor, lean_gig.projection)
+    return lean_gig.page(gigs, next_cursor)
 
 # ========== SERVICE ROUTES ==========
 @api_router.post("/services", response_model=Service)
-async def create_service(service_data: ServiceCreate, current_user: User = Depends(get_current_user)):
+async def create_service(service_data: ServiceCreate, current_user: Principal = Depends(get_current_user)):
     service = Service(**service_data.model_dump(), creator_id=current_user.id, creator_name=current_user.name)
     doc = service.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.services.insert_one(doc)
-    return service
+    service_feed.invalidate()
+    return lean_service.instance(service)
 
-@api_router.get("/services", response_model=List[Service])
-async def get_services():
-    services = await db.services.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    for service in services:
-        if isinstance(service['created_at'], str):
-            service['created_at'] = datetime.fromisoformat(service['created_at'])
-    return services
+@api_router.get("/services", response_model=Page[Service])
+async def get_services(
+    request: Request,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None
+):
+    etag, body = await service_feed.page(limit, cursor, min_price=min_price, max_price=max_price)
+    return etag_response(request, etag, body)
 
 @api_router.get("/services/{service_id}", response_model=Service)
 async def get_service(service_id: str):
-    service = await db.services.find_one({"id": service_id}, {"_id": 0})
+    service = await db.services.find_one({"id": service_id}, lean_service.projection)
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
-    if isinstance(service['created_at'], str):
-        service['created_at'] = datetime.fromisoformat(service['created_at'])
-    return Service(**service)
+    return lean_service.one(service)
 
-@api_router.post("/services/{service_id}/book")
-async def book_service(service_id: str, current_user: User = Depends(get_current_user)):
+@api_router.post("/services/{service_id}/book", dependencies=[rate_limit("book_service")])
+async def book_service(service_id: str, current_user: Principal = Depends(get_current_user)):
     service = await db.services.find_one({"id": service_id}, {"_id": 0})
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
@@ -398,7 +2721,6 @@ async def book_service(service_id: str, current_user: User = Depends(get_current
         commission=commission
     )
     order_doc = order.model_dump()
-    order_doc['created_at'] = order_doc['created_at'].isoformat()
     await db.orders.insert_one(order_doc)
     
     # Notify provider
@@ -410,68 +2732,61 @@ async def book_service(service_id: str, current_user: User = Depends(get_current
     
     return {"message": "Service booked", "order_id": order.id}
 
-@api_router.get("/services/my/created", response_model=List[Service])
-async def get_my_services(current_user: User = Depends(get_current_user)):
-    services = await db.services.find({"creator_id": current_user.id}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    for service in services:
-        if isinstance(service['created_at'], str):
-            service['created_at'] = datetime.fromisoformat(service['created_at'])
-    return services
+@api_router.get("/services/my/created", response_model=Page[Service])
+async def get_my_services(limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX), cursor: Optional[str] = None, current_user: Principal = Depends(get_current_user)):
+    services, next_cursor = await paginate(db.services, {"creator_id": current_user.id}, limit, cursor, lean_service.projection)
+    return lean_service.page(services, next_cursor)
 
 # ========== ORDER ROUTES ==========
-@api_router.get("/orders", response_model=List[Order])
-async def get_orders(current_user: User = Depends(get_current_user)):
-    orders = await db.orders.find(
-        {"$or": [{"buyer_id": current_user.id}, {"provider_id": current_user.id}]},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(1000)
-    for order in orders:
-        if isinstance(order['created_at'], str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
-        if order.get('cancelled_at') and isinstance(order['cancelled_at'], str):
-            order['cancelled_at'] = datetime.fromisoformat(order['cancelled_at'])
-    return orders
+@api_router.get("/orders", response_model=Page[Order])
+async def get_orders(limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX), cursor: Optional[str] = None, current_user: Principal = Depends(get_current_user)):
+    orders, next_cursor = await paginate(
+        db.orders, user_orders_query(current_user.id), limit, cursor, lean_order.projection
+    )
+    return lean_order.page(orders, next_cursor)
 
 @api_router.get("/orders/{order_id}", response_model=Order)
-async def get_order(order_id: str, current_user: User = Depends(get_current_user)):
-    order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+async def get_order(order_id: str, current_user: Principal = Depends(get_current_user)):
+    order = await db.orders.find_one({"id": order_id}, lean_order.projection)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     if order['buyer_id'] != current_user.id and order['provider_id'] != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    if isinstance(order['created_at'], str):
-        order['created_at'] = datetime.fromisoformat(order['created_at'])
-    if order.get('cancelled_at') and isinstance(order['cancelled_at'], str):
-        order['cancelled_at'] = datetime.fromisoformat(order['cancelled_at'])
-    return Order(**order)
+    return lean_order.one(order)
 
 @api_router.post("/orders/{order_id}/cancel")
-async def cancel_order(order_id: str, current_user: User = Depends(get_current_user)):
-    order = await db.orders.find_one({"id": order_id}, {"_id": 0})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    if order['buyer_id'] != current_user.id and order['provider_id'] != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    if order['status'] != 'active':
-        raise HTTPException(status_code=400, detail="Order already completed or cancelled")
+async def cancel_order(order_id: str, current_user: Principal = Depends(get_current_user)):
+    cancelled_at = datetime.now(timezone.utc)
+    async with transaction() as session:
+        order = await transition(
+            db.orders, order_id, "cancelled", ORDER_TRANSITIONS,
+            guard={"$or": [{"buyer_id": current_user.id}, {"provider_id": current_user.id}]},
+            changes={"cancelled_at": cancelled_at},
+            session=session
+        )
+        if not order:
+            existing = await db.orders.find_one({"id": order_id}, {"_id": 0}, session=session)
+            if not existing:
+                raise HTTPException(status_code=404, detail="Order not found")
+            if existing['buyer_id'] != current_user.id and existing['provider_id'] != current_user.id:
+                raise HTTPException(status_code=403, detail="Not authorized")
+            raise HTTPException(status_code=400, detail="Order already completed or cancelled")
+        
+        # Update gig/service status
+        if order.get('gig_id'):
+            await transition(db.gigs, order['gig_id'], "cancelled", GIG_TRANSITIONS, session=session)
+    if order.get('gig_id'):
+        open_gig_feed.invalidate()
     
+    # Orders written before the datetime migration may still hold ISO strings
     created_at = datetime.fromisoformat(order['created_at']) if isinstance(order['created_at'], str) else order['created_at']
-    time_diff = datetime.now(timezone.utc) - created_at
+    time_diff = cancelled_at - created_at
     
     # 50% fee after 2 minutes
     cancellation_fee = 0
     if time_diff.total_seconds() > 120:
         cancellation_fee = order['total_amount'] * 0.5
     
-    await db.orders.update_one(
-        {"id": order_id},
-        {"$set": {"status": "cancelled", "cancelled_at": datetime.now(timezone.utc).isoformat()}}
-    )
-    
-    # Update gig/service status
-    if order.get('gig_id'):
-        await db.gigs.update_one({"id": order['gig_id']}, {"$set": {"status": "cancelled"}})
-    
     # Notify other party
     other_user_id = order['provider_id'] if order['buyer_id'] == current_user.id else order['buyer_id']
     await create_notification(other_user_id, f"Order #{order_id[:8]} has been cancelled", "cancelled")
@@ -479,8 +2794,8 @@ async def cancel_order(order_id: str, current_user: User = Depends(get_current_u
     return {"message": "Order cancelled", "cancellation_fee": cancellation_fee}
 
 # ========== RATING ROUTES ==========
-@api_router.post("/ratings", response_model=Rating)
-async def create_rating(rating_data: RatingCreate, current_user: User = Depends(get_current_user)):
+@api_router.post("/ratings", response_model=Rating, dependencies=[rate_limit("create_rating")])
+async def create_rating(rating_data: RatingCreate, current_user: Principal = Depends(get_current_user)):
     order = await db.orders.find_one({"id": rating_data.order_id}, {"_id": 0})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -494,7 +2809,7 @@ async def create_rating(rating_data: RatingCreate, current_user: User = Depends(
     if existing:
         raise HTTPException(status_code=400, detail="Already rated this order")
     
-    to_user = await db.users.find_one({"id": rating_data.to_user_id}, {"_id": 0})
+    to_user = await db.users.find_one({"id": rating_data.to_user_id}, {"_id": 0, "id": 1, "name": 1})
     if not to_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -504,29 +2819,23 @@ async def create_rating(rating_data: RatingCreate, current_user: User = Depends(
         from_user_name=current_user.name,
         to_user_id=rating_data.to_user_id,
         to_user_name=to_user['name'],
+        # Only the buyer's review of the provider counts toward the service
+        service_id=order.get('service_id') if rating_data.to_user_id == order['provider_id'] else None,
         rating=rating_data.rating,
         review=rating_data.review
     )
     doc = rating.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.ratings.insert_one(doc)
-    
-    # Update user rating
-    user_ratings = await db.ratings.find({"to_user_id": rating_data.to_user_id}, {"_id": 0}).to_list(1000)
-    avg_rating = sum(r['rating'] for r in user_ratings) / len(user_ratings) if user_ratings else 0
-    await db.users.update_one(
-        {"id": rating_data.to_user_id},
-        {"$set": {"rating": round(avg_rating, 2), "rating_count": len(user_ratings)}}
-    )
+    try:
+        await db.ratings.insert_one(doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Already rated this order")
     
-    # Update service rating if applicable
-    if order.get('service_id'):
-        service_ratings = await db.ratings.find({"to_user_id": to_user['id']}, {"_id": 0}).to_list(1000)
-        service_avg = sum(r['rating'] for r in service_ratings) / len(service_ratings) if service_ratings else 0
-        await db.services.update_one(
-            {"id": order['service_id']},
-            {"$set": {"rating": round(service_avg, 2), "rating_count": len(service_ratings)}}
-        )
+    # Fold the new rating into the running user/service aggregates
+    await db.users.update_one({"id": rating_data.to_user_id}, add_rating_pipeline(rating_data.rating))
+    await user_cache.invalidate(rating_data.to_user_id)
+    if rating.service_id:
+        await db.services.update_one({"id": rating.service_id}, add_rating_pipeline(rating_data.rating))
+        service_feed.invalidate()
     
     # Notify rated user
     await create_notification(
@@ -537,81 +2846,375 @@ async def create_rating(rating_data: RatingCreate, current_user: User = Depends(
     
     return rating
 
-@api_router.get("/ratings/user/{user_id}", response_model=List[Rating])
-async def get_user_ratings(user_id: str):
-    ratings = await db.ratings.find({"to_user_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    for rating in ratings:
-        if isinstance(rating['created_at'], str):
-            rating['created_at'] = datetime.fromisoformat(rating['created_at'])
-    return ratings
+@api_router.get("/ratings/user/{user_id}", response_model=Page[Rating])
+async def get_user_ratings(user_id: str, limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX), cursor: Optional[str] = None):
+    ratings, next_cursor = await paginate(db.ratings, {"to_user_id": user_id}, limit, cursor, lean_rating.projection)
+    return lean_rating.page(ratings, next_cursor)
+
+# ========== SEARCH ROUTES ==========
+@api_router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: Literal['all', 'gigs', 'services'] = 'all',
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None
+):
+    offset = decode_offset_cursor(cursor) if cursor else 0
+    text = {"$text": {"$search": q}}
+    price_facet = {"price": [{"$bucket": {
+        "groupBy": "$price",
+        "boundaries": SEARCH_PRICE_BUCKETS,
+        "default": f"{SEARCH_PRICE_BUCKETS[-1]}+",
+        "output": {"count": {"$sum": 1}},
+    }}]}
+    # With both collections, each contributes its top offset+limit and the merge is cut afterwards
+    single = type != 'all'
+    skip, take = (offset, limit + 1) if single else (0, offset + limit + 1)
+    searches = {}
+    if type in ('all', 'gigs'):
+        gig_query = feed_query({**text, **({"status": status} if status else {})}, category, min_price, max_price)
+        searches['gigs'] = search_collection("gigs", Gig, "gig", gig_query, {
+            "category": [{"$sortByCount": "$category"}],
+            "status": [{"$sortByCount": "$status"}],
+            **price_facet,
+        }, skip, take)
+    if type in ('all', 'services') and not category and not status:
+        service_query = feed_query(text, None, min_price, max_price)
+        searches['services'] = search_collection("services", Service, "service", service_query, price_facet, skip, take)
+    results = dict(zip(searches, await asyncio.gather(*searches.values())))
+    
+    items = [item for found, _, _ in results.values() for item in found]
+    if not single:
+        items.sort(key=lambda item: (item['score'], item['created_at'], item['id']), reverse=True)
+        items = items[offset:]
+    next_cursor = None
+    if len(items) > limit and offset + limit < SEARCH_MAX_RESULTS:
+        next_cursor = encode_offset_cursor(offset + limit)
+    return {
+        "items": items[:limit],
+        "next_cursor": next_cursor,
+        "total": {name: total for name, (_, total, _) in results.items()},
+        "facets": {name: facets for name, (_, _, facets) in results.items()},
+    }
+
+# ========== SCREEN ROUTES ==========
+# Each screen authenticates once and runs its list queries concurrently; tabs
+# page further through the regular list endpoints with the returned cursors
+@api_router.get("/home")
+async def get_home(current_user: Principal = Depends(get_current_user)):
+    open_gigs, my_active_gigs, orders, my_services = await asyncio.gather(
+        open_gig_feed.head(HOME_RECENT_GIGS),
+        screen_count(db.gigs, {"poster_id": current_user.id, "status": {"$in": ["open", "accepted"]}}),
+        screen_count(db.orders, user_orders_query(current_user.id)),
+        screen_count(db.services, {"creator_id": current_user.id}),
+    )
+    return LeanJSONResponse({
+        "open_gigs": open_gigs,
+        "my_active_gigs": my_active_gigs,
+        "orders": orders,
+        "my_services": my_services,
+    })
+
+@api_router.get("/screens/gigs")
+async def get_gigs_screen(limit: int = Query(SCREEN_SLICE_SIZE, ge=1, le=PAGE_SIZE_MAX), current_user: Principal = Depends(get_current_user)):
+    open_gigs, posted, accepted = await asyncio.gather(
+        open_gig_feed.head(limit),
+        screen_slice(lean_gig, db.gigs, {"poster_id": current_user.id}, limit),
+        screen_slice(lean_gig, db.gigs, {"acceptor_id": current_user.id}, limit),
+    )
+    return LeanJSONResponse({"open": open_gigs, "posted": posted, "accepted": accepted})
+
+@api_router.get("/screens/services")
+async def get_services_screen(limit: int = Query(SCREEN_SLICE_SIZE, ge=1, le=PAGE_SIZE_MAX), current_user: Principal = Depends(get_current_user)):
+    services, mine = await asyncio.gather(
+        service_feed.head(limit),
+        screen_slice(lean_service, db.services, {"creator_id": current_user.id}, limit),
+    )
+    return LeanJSONResponse({"all": services, "mine": mine})
 
 # ========== NOTIFICATION ROUTES ==========
-@api_router.get("/notifications", response_model=List[Notification])
-async def get_notifications(current_user: User = Depends(get_current_user)):
-    notifications = await db.notifications.find(
-        {"user_id": current_user.id},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(1000)
-    for notif in notifications:
-        if isinstance(notif['created_at'], str):
-            notif['created_at'] = datetime.fromisoformat(notif['created_at'])
-    return notifications
+@api_router.get("/notifications", response_model=Page[Notification])
+async def get_notifications(limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX), cursor: Optional[str] = None, unread: bool = False, current_user: Principal = Depends(get_current_user)):
+    query = {"user_id": current_user.id, "read": False} if unread else {"user_id": current_user.id}
+    notifications, next_cursor = await paginate(db.notifications, query, limit, cursor, lean_notification.projection)
+    return lean_notification.page(notifications, next_cursor)
+
+@api_router.get("/notifications/unread-count")
+async def get_unread_count(current_user: Principal = Depends(get_current_user)):
+    count = await db.notifications.count_documents({"user_id": current_user.id, "read": False})
+    return {"unread": count}
+
+@api_router.get("/notifications/stream")
+async def stream_notifications(
+    request: Request,
+    current_user: Principal = Depends(get_stream_user),
+    token: str = Depends(get_stream_token)
+):
+    queue = notification_broker.subscribe(current_user.id)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                # End the stream once the token expires or is revoked; the
+                # client's reconnect then has to present a fresh one
+                remaining = await token_auth.remaining(token)
+                if remaining <= 0:
+                    break
+                try:
+                    payload = await asyncio.wait_for(queue.get(), min(NOTIFICATION_KEEPALIVE, remaining))
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: notification\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            notification_broker.unsubscribe(current_user.id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.websocket("/notifications/ws")
+async def notifications_websocket(websocket: WebSocket, token: str):
+    try:
+        user = await token_auth.authenticate(token)
+    except HTTPException:
+        await websocket.close(code=4401)
+        return
+    await websocket.accept()
+    queue = notification_broker.subscribe(user.id)
+
+    async def forward():
+        while (remaining := await token_auth.remaining(token)) > 0:
+            try:
+                payload = await asyncio.wait_for(queue.get(), min(NOTIFICATION_KEEPALIVE, remaining))
+            except asyncio.TimeoutError:
+                continue
+            await websocket.send_json(payload)
+        await websocket.close(code=4401)
+
+    async def receive():
+        # Clients never send; receiving only surfaces the disconnect promptly
+        while True:
+            await websocket.receive_text()
+
+    sender = asyncio.create_task(forward())
+    receiver = asyncio.create_task(receive())
+    try:
+        await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        sender.cancel()
+        receiver.cancel()
+        results = await asyncio.gather(sender, receiver, return_exceptions=True)
+        notification_broker.unsubscribe(user.id, queue)
+    for result in results:
+        if isinstance(result, Exception) and not isinstance(result, WebSocketDisconnect):
+            logger.error("Notification websocket for user %s failed", user.id, exc_info=result)
+
+@api_router.post("/notifications/read")
+async def mark_notifications_read(read_data: NotificationRead, current_user: Principal = Depends(get_current_user)):
+    if (read_data.ids is None) == (read_data.before is None):
+        raise HTTPException(status_code=400, detail="Provide either ids or before")
+    query = {"user_id": current_user.id, "read": False}
+    if read_data.ids is not None:
+        query["id"] = {"$in": read_data.ids}
+    else:
+        before = _as_utc(read_data.before)
+        # Unmigrated notifications still hold ISO strings, which a date $lte never matches
+        query["$or"] = [{"created_at": {"$lte": before}}, {"created_at": {"$lte": before.isoformat()}}]
+    result = await db.notifications.update_many(query, {"$set": {"read": True, "read_at": datetime.now(timezone.utc)}})
+    return {"updated": result.modified_count}
 
 @api_router.post("/notifications/{notif_id}/read")
-async def mark_notification_read(notif_id: str, current_user: User = Depends(get_current_user)):
-    notif = await db.notifications.find_one({"id": notif_id}, {"_id": 0})
-    if not notif:
-        raise HTTPException(status_code=404, detail="Notification not found")
-    if notif['user_id'] != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    await db.notifications.update_one({"id": notif_id}, {"$set": {"read": True}})
+async def mark_notification_read(notif_id: str, current_user: Principal = Depends(get_current_user)):
+    result = await db.notifications.update_one(
+        {"id": notif_id, "user_id": current_user.id, "read": False},
+        {"$set": {"read": True, "read_at": datetime.now(timezone.utc)}}
+    )
+    if not result.modified_count:
+        # Either already read, someone else's, or missing
+        notif = await db.notifications.find_one({"id": notif_id}, {"_id": 0, "user_id": 1})
+        if not notif:
+            raise HTTPException(status_code=404, detail="Notification not found")
+        if notif['user_id'] != current_user.id:
+            raise HTTPException(status_code=403, detail="Not authorized")
     return {"message": "Notification marked as read"}
 
+# ========== HEALTH ROUTES ==========
+@api_router.get("/health/live")
+async def liveness():
+    """The worker's event loop is answering requests."""
+    return {
+        "status": "alive",
+        "worker": worker_id(),
+        "uptime_s": round(time.monotonic() - lifecycle.started_at, 3) if lifecycle.started_at else 0.0,
+        "event_loop_lag_ms": round(event_loop_monitor.lag * 1000, 3),
+    }
+
+@api_router.get("/health/ready")
+async def readiness():
+    """Warmed up, not draining and able to reach Mongo."""
+    if lifecycle.state != "ready":
+        return JSONResponse({"status": lifecycle.state}, status_code=503)
+    try:
+        await asyncio.wait_for(db.command("ping"), HEALTH_CHECK_TIMEOUT)
+    except Exception:
+        return JSONResponse({"status": "database unavailable"}, status_code=503)
+    return {"status": "ready", "worker": worker_id()}
+
 # ========== ADMIN ROUTES ==========
-@api_router.get("/admin/users", response_model=List[User])
-async def admin_get_users(current_user: User = Depends(get_current_user)):
-    users = await db.users.find({}, {"_id": 0, "password_hash": 0}).to_list(1000)
-    for user in users:
-        if isinstance(user['created_at'], str):
-            user['created_at'] = datetime.fromisoformat(user['created_at'])
-    return users
-
-@api_router.get("/admin/gigs", response_model=List[Gig])
-async def admin_get_gigs(current_user: User = Depends(get_current_user)):
-    gigs = await db.gigs.find({}, {"_id": 0}).to_list(1000)
-    for gig in gigs:
-        if isinstance(gig['created_at'], str):
-            gig['created_at'] = datetime.fromisoformat(gig['created_at'])
-    return gigs
-
-@api_router.get("/admin/services", response_model=List[Service])
-async def admin_get_services(current_user: User = Depends(get_current_user)):
-    services = await db.services.find({}, {"_id": 0}).to_list(1000)
-    for service in services:
-        if isinstance(service['created_at'], str):
-            service['created_at'] = datetime.fromisoformat(service['created_at'])
-    return services
-
-@api_router.get("/admin/orders", response_model=List[Order])
-async def admin_get_orders(current_user: User = Depends(get_current_user)):
-    orders = await db.orders.find({}, {"_id": 0}).to_list(1000)
-    for order in orders:
-        if isinstance(order['created_at'], str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
-        if order.get('cancelled_at') and isinstance(order['cancelled_at'], str):
-            order['cancelled_at'] = datetime.fromisoformat(order['cancelled_at'])
-    return orders
-
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@api_router.get("/admin/users", response_model=Page[User])
+async def admin_get_users(limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX), cursor: Optional[str] = None, current_user: User = Depends(get_admin_user)):
+    users, next_cursor = await paginate(db.reads('admin').users, {}, limit, cursor, lean_user.projection)
+    return lean_user.page(users, next_cursor)
+
+@api_router.get("/admin/gigs", response_model=Page[Gig])
+async def admin_get_gigs(limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX), cursor: Optional[str] = None, current_user: User = Depends(get_admin_user)):
+    gigs, next_cursor = await paginate(db.reads('admin').gigs, {}, limit, cursor, lean_gig.projection)
+    return lean_gig.page(gigs, next_cursor)
+
+@api_router.get("/admin/services", response_model=Page[Service])
+async def admin_get_services(limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX), cursor: Optional[str] = None, current_user: User = Depends(get_admin_user)):
+    services, next_cursor = await paginate(db.reads('admin').services, {}, limit, cursor, lean_service.projection)
+    return lean_service.page(services, next_cursor)
+
+@api_router.get("/admin/orders", response_model=Page[Order])
+async def admin_get_orders(limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX), cursor: Optional[str] = None, current_user: User = Depends(get_admin_user)):
+    orders, next_cursor = await paginate(db.reads('admin').orders, {}, limit, cursor, lean_order.projection)
+    return lean_order.page(orders, next_cursor)
+
+@api_router.get("/admin/export/{collection}")
+async def admin_export(
+    collection: Literal["users", "gigs", "services", "orders"],
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    since: Optional[datetime] = None,
+    current_user: User = Depends(get_admin_user)
+):
+    filename = f"{collection}-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.{fmt}"
+    return StreamingResponse(
+        export_rows(collection, fmt, _as_utc(since) if since else None),
+        media_type="text/csv" if fmt == 'csv' else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    )
+
+@api_router.get("/admin/stats")
+async def admin_stats(days: int = Query(30, ge=1, le=366), current_user: User = Depends(get_admin_user)):
+    summary = await db.admin_stats.find_one({"_id": "summary"}, {"_id": 0})
+    if not summary:
+        await refresh_admin_stats(None)
+        summary = await db.admin_stats.find_one({"_id": "summary"}, {"_id": 0})
+    
+    today = datetime.now(timezone.utc).date()
+    dates = [(today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+    rows = await db.admin_stats_daily.find({"_id": {"$gte": dates[0]}}).to_list(days)
+    by_date = {row.pop('_id'): row for row in rows}
+    empty = {"orders": 0, "completed": 0, "cancelled": 0, "gmv": 0, "commission": 0,
+             "new_users": 0, "new_gigs": 0, "new_services": 0}
+    daily = [{"date": date, **empty, **by_date.get(date, {})} for date in dates]
+    
+    orders_by_status = summary['orders_by_status']
+    total_orders = sum(row['count'] for row in orders_by_status.values())
+    cancelled = orders_by_status.get('cancelled', {"count": 0})['count']
+    live = [row for status_name, row in orders_by_status.items() if status_name != 'cancelled']
+    return {
+        "refreshed_at": summary['refreshed_at'],
+        "totals": {
+            "users": summary['users'],
+            "gigs": sum(summary['gigs_by_status'].values()),
+            "services": summary['services'],
+            "orders": total_orders,
+        },
+        "gigs_by_status": summary['gigs_by_status'],
+        "orders_by_status": {status_name: row['count'] for status_name, row in orders_by_status.items()},
+        "gmv": round(sum(row['amount'] for row in live), 2),
+        "commission": round(sum(row['commission'] for row in live), 2),
+        "cancellation_rate": round(cancelled / total_orders, 4) if total_orders else 0.0,
+        "daily": daily,
+    }
+
+@api_router.post("/admin/stats/refresh")
+async def admin_refresh_stats(full: bool = False, current_user: User = Depends(get_admin_user)):
+    await refresh_admin_stats(None if full else ADMIN_STATS_LOOKBACK_DAYS)
+    return {"message": "Stats refreshed"}
+
+@api_router.get("/admin/password-pool")
+async def admin_password_pool(current_user: User = Depends(get_admin_user)):
+    return password_pool.stats()
+
+@api_router.get("/admin/user-cache")
+async def admin_user_cache(current_user: User = Depends(get_admin_user)):
+    return user_cache.stats()
+
+@api_router.get("/admin/token-auth")
+async def admin_token_auth(current_user: User = Depends(get_admin_user)):
+    return token_auth.stats()
+
+@api_router.get("/admin/rate-limits")
+async def admin_rate_limits(current_user: User = Depends(get_admin_user)):
+    return rate_limiter.stats()
+
+@api_router.get("/admin/load-shedding")
+async def admin_load_shedding(current_user: User = Depends(get_admin_user)):
+    return load_shedder.stats()
+
+@api_router.get("/admin/notification-broker")
+async def admin_notification_broker(current_user: User = Depends(get_admin_user)):
+    return notification_broker.stats()
+
+@api_router.get("/admin/notification-writer")
+async def admin_notification_writer(current_user: User = Depends(get_admin_user)):
+    return notification_writer.stats()
+
+@api_router.get("/admin/name-fanout")
+async def admin_name_fanout(current_user: User = Depends(get_admin_user)):
+    return name_fanout.stats()
+
+@api_router.get("/admin/feed-cache")
+async def admin_feed_cache(current_user: User = Depends(get_admin_user)):
+    return {"gigs": open_gig_feed.stats(), "services": service_feed.stats()}
+
+@api_router.post("/admin/ratings/reconcile")
+async def admin_reconcile_ratings(current_user: User = Depends(get_admin_user)):
+    await reconcile_ratings()
+    return {"message": "Ratings reconciled"}
+
+@api_router.get("/admin/indexes")
+async def admin_index_check(current_user: User = Depends(get_admin_user)):
+    results = await verify_query_plans()
+    return {"ok": not any(r['collscan'] for r in results), "queries": results}
+
+@api_router.get("/admin/mongo-pool")
+async def admin_mongo_pool(current_user: User = Depends(get_admin_user)):
+    return mongo_pool_metrics.stats()
+
+@api_router.get("/admin/event-loop")
+async def admin_event_loop(current_user: User = Depends(get_admin_user)):
+    return event_loop_monitor.stats()
+
+# Served outside /api for in-cluster scrapers; the public ingress only routes /api
+@ops_router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+REGISTRY.register(StatsCollector({
+    "password_pool": password_pool.stats,
+    "user_cache": user_cache.stats,
+    "token_auth": token_auth.stats,
+    "rate_limiter": rate_limiter.stats,
+    "load_shedder": load_shedder.stats,
+    "notification_writer": notification_writer.stats,
+    "notification_broker": notification_broker.stats,
+    "gig_feed": open_gig_feed.stats,
+    "service_feed": service_feed.stats,
+    "event_loop": event_loop_monitor.stats,
+    "mongo_pool": mongo_pool_metrics.stats,
+    "name_fanout": name_fanout.stats,
+}))
 
 logging.basicConfig(
     level=logging.INFO,
@@ -619,6 +3222,98 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+# ========== LIFECYCLE ==========
+class Lifecycle:
+    """Per-worker startup and shutdown. Warmup (indexes, revocations, feed
+    snapshots) finishes before the server accepts connections; shutdown stops
+    the background jobs and flushes queued writes once uvicorn has let
+    in-flight requests finish."""
+
+    def __init__(self):
+        self.state = "starting"
+        self.started_at = None
+        self.tasks: List[asyncio.Task] = []
+
+    async def warmup(self):
+        db.connect()
+        await ensure_indexes()
+        await ensure_notification_retention()
+        if INDEX_CHECK_ON_STARTUP:
+            collscans = [r['route'] for r in await verify_query_plans() if r['collscan']]
+            if collscans:
+                raise RuntimeError(f"Route queries fall back to COLLSCAN: {', '.join(collscans)}")
+        await token_auth.sync()
+        await asyncio.gather(open_gig_feed.load(), service_feed.load())
+        if WEB_CONCURRENCY > 1 and NOTIFICATION_BROKER == 'local':
+            logger.warning("NOTIFICATION_BROKER=local with %d workers: live notifications only "
+                           "reach streams on the worker that wrote them", WEB_CONCURRENCY)
+
+    def start_jobs(self):
+        password_pool.start()
+        notification_writer.start()
+        self.tasks.append(asyncio.create_task(name_fanout.run()))
+        if NOTIFICATION_RETENTION == 'archive' and NOTIFICATION_ARCHIVE_INTERVAL > 0:
+            self.tasks.append(asyncio.create_task(notification_archive_loop()))
+        if RATING_RECONCILE_INTERVAL > 0:
+            self.tasks.append(asyncio.create_task(rating_reconcile_loop()))
+        if NOTIFICATION_BROKER == 'changestream':
+            self.tasks.append(asyncio.create_task(notification_change_stream_loop()))
+        if ADMIN_STATS_REFRESH_INTERVAL > 0:
+            self.tasks.append(asyncio.create_task(admin_stats_loop()))
+        if EVENT_LOOP_LAG_INTERVAL > 0:
+            self.tasks.append(asyncio.create_task(event_loop_monitor.run()))
+        if TOKEN_REVOCATION_SYNC_INTERVAL > 0:
+            self.tasks.append(asyncio.create_task(token_auth.sync_loop()))
+
+    async def drain(self):
+        self.state = "draining"
+        # Pending name fan-outs keep their job record and resume on the next start
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks.clear()
+        await notification_writer.drain(NOTIFICATION_DRAIN_TIMEOUT)
+        for lease in (notification_archive_lease, rating_reconcile_lease, admin_stats_lease):
+            try:
+                await lease.release()
+            except Exception:
+                logger.exception("Failed to release lease %s", lease.name)
+        password_pool.shutdown()
+        db.close()
+        self.state = "stopped"
+
+lifecycle = Lifecycle()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    lifecycle.started_at = time.monotonic()
+    await lifecycle.warmup()
+    lifecycle.start_jobs()
+    lifecycle.state = "ready"
+    logger.info("Worker %s ready", worker_id())
+    try:
+        yield
+    finally:
+        await lifecycle.drain()
+        logger.info("Worker %s drained", worker_id())
+
+def create_app() -> FastAPI:
+    """Build the ASGI app. Nothing connects at import: each worker opens its own
+    Motor pool and starts its own jobs in the lifespan."""
+    application = FastAPI(lifespan=lifespan)
+    application.include_router(api_router)
+    application.include_router(ops_router)
+    # Added first so it runs inside CORS (rejections keep their CORS headers) and
+    # inside metrics (rejections are counted)
+    application.add_middleware(LoadSheddingMiddleware, shedder=load_shedder)
+    application.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    application.add_middleware(MetricsMiddleware)
+    return application
+
+app = create_app()
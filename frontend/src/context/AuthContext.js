@@ -1,4 +1,4 @@
-import { createContext, useContext, useState, useEffect } from 'react';
+import { createContext, useContext, useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 
 const AuthContext = createContext();
@@ -12,11 +12,55 @@ export const useAuth = () => {
 };
 
 const API_URL = process.env.REACT_APP_BACKEND_URL + '/api';
+const TOKEN_ENDPOINTS = ['/auth/login', '/auth/signup', '/auth/refresh', '/auth/logout'];
 
 export const AuthProvider = ({ children }) => {
   const [user, setUser] = useState(null);
   const [token, setToken] = useState(localStorage.getItem('token'));
   const [loading, setLoading] = useState(true);
+  const refreshing = useRef(null);
+
+  const storeTokens = ({ token: newToken, refresh_token: refreshToken }) => {
+    localStorage.setItem('token', newToken);
+    localStorage.setItem('refreshToken', refreshToken);
+    setToken(newToken);
+    return newToken;
+  };
+
+  // Rotate the refresh token, once for all concurrent callers, and resolve to
+  // the new access token
+  const refresh = () => {
+    if (!refreshing.current) {
+      refreshing.current = axios.post(`${API_URL}/auth/refresh`, { refresh_token: localStorage.getItem('refreshToken') })
+        .then((response) => storeTokens(response.data))
+        .finally(() => { refreshing.current = null; });
+    }
+    return refreshing.current;
+  };
+
+  // Access tokens are short-lived: on a 401, rotate the refresh token once
+  // (shared by concurrent requests) and replay the request with the new token.
+  // A 401 from the token endpoints themselves is final; /auth/me is retried.
+  useEffect(() => {
+    const interceptor = axios.interceptors.response.use(null, async (error) => {
+      const request = error.config;
+      const refreshToken = localStorage.getItem('refreshToken');
+      const tokenEndpoint = TOKEN_ENDPOINTS.some((path) => request.url.endsWith(path));
+      if (error.response?.status !== 401 || !refreshToken || request._retried || tokenEndpoint) {
+        return Promise.reject(error);
+      }
+      request._retried = true;
+      try {
+        const newToken = await refresh();
+        request.headers.Authorization = `Bearer ${newToken}`;
+        return axios(request);
+      } catch (refreshError) {
+        logout();
+        return Promise.reject(error);
+      }
+    });
+    return () => axios.interceptors.response.eject(interceptor);
+  }, []);
 
   useEffect(() => {
     if (token) {
@@ -42,24 +86,30 @@ export const AuthProvider = ({ children }) => {
 
   const login = async (email, password) => {
     const response = await axios.post(`${API_URL}/auth/login`, { email, password });
-    const { token: newToken, user: userData } = response.data;
-    localStorage.setItem('token', newToken);
-    setToken(newToken);
+    const { user: userData } = response.data;
+    storeTokens(response.data);
     setUser(userData);
     return userData;
   };
 
   const signup = async (userData) => {
     const response = await axios.post(`${API_URL}/auth/signup`, userData);
-    const { token: newToken, user: newUser } = response.data;
-    localStorage.setItem('token', newToken);
-    setToken(newToken);
+    const { user: newUser } = response.data;
+    storeTokens(response.data);
     setUser(newUser);
     return newUser;
   };
 
   const logout = () => {
+    const currentToken = localStorage.getItem('token');
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (currentToken) {
+      axios.post(`${API_URL}/auth/logout`, { refresh_token: refreshToken }, {
+        headers: { Authorization: `Bearer ${currentToken}` }
+      }).catch(() => {});
+    }
     localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
     setToken(null);
     setUser(null);
   };
@@ -69,7 +119,7 @@ export const AuthProvider = ({ children }) => {
   };
 
   return (
-    <AuthContext.Provider value={{ user, token, login, signup, logout, updateUser, loading }}>
+    <AuthContext.Provider value={{ user, token, login, signup, logout, refresh, updateUser, loading }}>
       {children}
     </AuthContext.Provider>
   );
@@ -15,6 +15,7 @@ const AdminDashboard = () => {
   const [gigs, setGigs] = useState([]);
   const [services, setServices] = useState([]);
   const [orders, setOrders] = useState([]);
+  const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
   const [activeTab, setActiveTab] = useState('users');
 
@@ -25,16 +26,18 @@ const AdminDashboard = () => {
   const fetchAdminData = async () => {
     try {
       const headers = { Authorization: `Bearer ${token}` };
-      const [usersRes, gigsRes, servicesRes, ordersRes] = await Promise.all([
+      const [statsRes, usersRes, gigsRes, servicesRes, ordersRes] = await Promise.all([
+        axios.get(`${API_URL}/admin/stats`, { headers }),
         axios.get(`${API_URL}/admin/users`, { headers }),
         axios.get(`${API_URL}/admin/gigs`, { headers }),
         axios.get(`${API_URL}/admin/services`, { headers }),
         axios.get(`${API_URL}/admin/orders`, { headers }),
       ]);
-      setUsers(usersRes.data);
-      setGigs(gigsRes.data);
-      setServices(servicesRes.data);
-      setOrders(ordersRes.data);
+      setStats(statsRes.data);
+      setUsers(usersRes.data.items);
+      setGigs(gigsRes.data.items);
+      setServices(servicesRes.data.items);
+      setOrders(ordersRes.data.items);
     } catch (error) {
       console.error('Failed to fetch admin data:', error);
       toast.error('Failed to load admin data');
@@ -70,25 +73,25 @@ const AdminDashboard = () => {
         <div className="grid grid-cols-2 md:grid-cols-4 gap-4 mb-8">
           <div className="bg-white rounded-2xl border border-green-100 p-6 shadow-sm" data-testid="stat-total-users">
             <Users className="w-8 h-8 text-primary mb-2" />
-            <div className="text-3xl font-bold font-outfit text-primary-foreground">{users.length}</div>
+            <div className="text-3xl font-bold font-outfit text-primary-foreground">{stats?.totals.users ?? 0}</div>
             <div className="text-sm text-muted-foreground">Total Users</div>
           </div>
 
           <div className="bg-white rounded-2xl border border-green-100 p-6 shadow-sm" data-testid="stat-total-gigs">
             <Briefcase className="w-8 h-8 text-primary mb-2" />
-            <div className="text-3xl font-bold font-outfit text-primary-foreground">{gigs.length}</div>
+            <div className="text-3xl font-bold font-outfit text-primary-foreground">{stats?.totals.gigs ?? 0}</div>
             <div className="text-sm text-muted-foreground">Total Gigs</div>
           </div>
 
           <div className="bg-white rounded-2xl border border-green-100 p-6 shadow-sm" data-testid="stat-total-services">
             <ShoppingBag className="w-8 h-8 text-primary mb-2" />
-            <div className="text-3xl font-bold font-outfit text-primary-foreground">{services.length}</div>
+            <div className="text-3xl font-bold font-outfit text-primary-foreground">{stats?.totals.services ?? 0}</div>
             <div className="text-sm text-muted-foreground">Total Services</div>
           </div>
 
           <div className="bg-white rounded-2xl border border-green-100 p-6 shadow-sm" data-testid="stat-total-orders">
             <ClipboardList className="w-8 h-8 text-primary mb-2" />
-            <div className="text-3xl font-bold font-outfit text-primary-foreground">{orders.length}</div>
+            <div className="text-3xl font-bold font-outfit text-primary-foreground">{stats?.totals.orders ?? 0}</div>
             <div className="text-sm text-muted-foreground">Total Orders</div>
           </div>
         </div>
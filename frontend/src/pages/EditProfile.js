@@ -7,20 +7,22 @@ import { BottomNav } from '../components/BottomNav';
 import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
 import { Label } from '../components/ui/label';
-import { ArrowLeft, User, Mail, School, Phone } from 'lucide-react';
+import { ArrowLeft, User, Mail, School, Phone, Camera } from 'lucide-react';
 import { toast } from 'sonner';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL + '/api';
+// Uploaded pictures are stored as /api/pictures/<hash> paths on the backend
+const pictureUrl = (picture) => (picture?.startsWith('/') ? process.env.REACT_APP_BACKEND_URL + picture : picture);
 
 const EditProfile = () => {
   const { user, token, updateUser } = useAuth();
   const navigate = useNavigate();
   const [loading, setLoading] = useState(false);
+  const [uploading, setUploading] = useState(false);
   const [formData, setFormData] = useState({
     name: '',
     college: '',
     phone: '',
-    picture: '',
   });
 
   useEffect(() => {
@@ -29,7 +31,6 @@ const EditProfile = () => {
         name: user.name || '',
         college: user.college || '',
         phone: user.phone || '',
-        picture: user.picture || '',
       });
     }
   }, [user]);
@@ -38,6 +39,26 @@ const EditProfile = () => {
     setFormData({ ...formData, [e.target.name]: e.target.value });
   };
 
+  const handlePictureChange = async (e) => {
+    const file = e.target.files[0];
+    if (!file) return;
+    setUploading(true);
+    try {
+      const body = new FormData();
+      body.append('file', file);
+      const response = await axios.post(`${API_URL}/users/picture`, body, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      updateUser(response.data);
+      toast.success('Profile picture updated');
+    } catch (error) {
+      toast.error(error.response?.data?.detail || 'Failed to upload picture');
+    } finally {
+      setUploading(false);
+      e.target.value = '';
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     if (!formData.name || !formData.college) {
@@ -78,6 +99,30 @@ const EditProfile = () => {
             Edit Profile
           </h1>
 
+          <div className="flex items-center gap-4 mb-6">
+            <div className="w-20 h-20 rounded-full bg-green-100 overflow-hidden flex items-center justify-center">
+              {user?.picture ? (
+                <img src={pictureUrl(user.picture)} alt={user.name} className="w-full h-full object-cover" data-testid="profile-picture" />
+              ) : (
+                <User className="w-10 h-10 text-primary" />
+              )}
+            </div>
+            <Label htmlFor="picture" className="cursor-pointer">
+              <span className="inline-flex items-center px-4 py-2 rounded-full border border-green-200 text-sm font-medium hover:bg-green-50">
+                <Camera className="w-4 h-4 mr-2" /> {uploading ? 'Uploading...' : 'Change Photo'}
+              </span>
+              <input
+                id="picture"
+                type="file"
+                accept="image/*"
+                data-testid="edit-picture-input"
+                onChange={handlePictureChange}
+                disabled={uploading}
+                className="hidden"
+              />
+            </Label>
+          </div>
+
           <form onSubmit={handleSubmit} className="space-y-6">
             <div>
               <Label htmlFor="name" className="text-sm font-medium mb-2 block">
@@ -10,12 +10,13 @@ import { Plus, Briefcase, Clock, CheckCircle2, XCircle } from 'lucide-react';
 import { toast } from 'sonner';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL + '/api';
+const EMPTY_SLICE = { items: [], count: 0, next_cursor: null };
 
 const Gigs = () => {
   const { token } = useAuth();
-  const [gigs, setGigs] = useState([]);
-  const [myPostedGigs, setMyPostedGigs] = useState([]);
-  const [myAcceptedGigs, setMyAcceptedGigs] = useState([]);
+  const [gigs, setGigs] = useState(EMPTY_SLICE);
+  const [myPostedGigs, setMyPostedGigs] = useState(EMPTY_SLICE);
+  const [myAcceptedGigs, setMyAcceptedGigs] = useState(EMPTY_SLICE);
   const [loading, setLoading] = useState(true);
   const [activeTab, setActiveTab] = useState('all');
 
@@ -26,14 +27,10 @@ const Gigs = () => {
   const fetchGigs = async () => {
     try {
       const headers = { Authorization: `Bearer ${token}` };
-      const [allRes, postedRes, acceptedRes] = await Promise.all([
-        axios.get(`${API_URL}/gigs?status=open`, { headers }),
-        axios.get(`${API_URL}/gigs/my/posted`, { headers }),
-        axios.get(`${API_URL}/gigs/my/accepted`, { headers }),
-      ]);
-      setGigs(allRes.data);
-      setMyPostedGigs(postedRes.data);
-      setMyAcceptedGigs(acceptedRes.data);
+      const response = await axios.get(`${API_URL}/screens/gigs`, { headers });
+      setGigs(response.data.open);
+      setMyPostedGigs(response.data.posted);
+      setMyAcceptedGigs(response.data.accepted);
     } catch (error) {
       console.error('Failed to fetch gigs:', error);
       toast.error('Failed to load gigs');
@@ -42,6 +39,33 @@ const Gigs = () => {
     }
   };
 
+  const loadMore = async (url, slice, setSlice) => {
+    try {
+      const response = await axios.get(url, {
+        headers: { Authorization: `Bearer ${token}` },
+        params: { cursor: slice.next_cursor },
+      });
+      setSlice({
+        ...slice,
+        items: [...slice.items, ...response.data.items],
+        next_cursor: response.data.next_cursor,
+      });
+    } catch (error) {
+      console.error('Failed to load more gigs:', error);
+      toast.error('Failed to load more gigs');
+    }
+  };
+
+  const LoadMore = ({ url, slice, setSlice }) => (
+    slice.next_cursor ? (
+      <div className="text-center pt-2">
+        <Button variant="ghost" className="rounded-full" onClick={() => loadMore(url, slice, setSlice)}>
+          Load more
+        </Button>
+      </div>
+    ) : null
+  );
+
   const getStatusIcon = (status) => {
     switch (status) {
       case 'open':
@@ -118,29 +142,32 @@ const Gigs = () => {
         <Tabs value={activeTab} onValueChange={setActiveTab} className="w-full">
           <TabsList className="mb-6 bg-white border border-green-100 p-1 rounded-xl">
             <TabsTrigger value="all" data-testid="tab-all-gigs" className="rounded-lg">
-              <Briefcase className="w-4 h-4 mr-2" /> All Gigs ({gigs.length})
+              <Briefcase className="w-4 h-4 mr-2" /> All Gigs ({gigs.count})
             </TabsTrigger>
             <TabsTrigger value="posted" data-testid="tab-my-posted" className="rounded-lg">
-              My Posted ({myPostedGigs.length})
+              My Posted ({myPostedGigs.count})
             </TabsTrigger>
             <TabsTrigger value="accepted" data-testid="tab-my-accepted" className="rounded-lg">
-              My Accepted ({myAcceptedGigs.length})
+              My Accepted ({myAcceptedGigs.count})
             </TabsTrigger>
           </TabsList>
 
           <TabsContent value="all" className="space-y-4">
-            {gigs.length === 0 ? (
+            {gigs.items.length === 0 ? (
               <div className="text-center py-12">
                 <Briefcase className="w-16 h-16 text-muted-foreground mx-auto mb-4" />
                 <p className="text-muted-foreground">No open gigs available</p>
               </div>
             ) : (
-              gigs.map((gig) => <GigCard key={gig.id} gig={gig} />)
+              <>
+                {gigs.items.map((gig) => <GigCard key={gig.id} gig={gig} />)}
+                <LoadMore url={`${API_URL}/gigs?status=open`} slice={gigs} setSlice={setGigs} />
+              </>
             )}
           </TabsContent>
 
           <TabsContent value="posted" className="space-y-4">
-            {myPostedGigs.length === 0 ? (
+            {myPostedGigs.items.length === 0 ? (
               <div className="text-center py-12">
                 <Briefcase className="w-16 h-16 text-muted-foreground mx-auto mb-4" />
                 <p className="text-muted-foreground mb-4">You haven't posted any gigs yet</p>
@@ -151,18 +178,24 @@ const Gigs = () => {
                 </Link>
               </div>
             ) : (
-              myPostedGigs.map((gig) => <GigCard key={gig.id} gig={gig} />)
+              <>
+                {myPostedGigs.items.map((gig) => <GigCard key={gig.id} gig={gig} />)}
+                <LoadMore url={`${API_URL}/gigs/my/posted`} slice={myPostedGigs} setSlice={setMyPostedGigs} />
+              </>
             )}
           </TabsContent>
 
           <TabsContent value="accepted" className="space-y-4">
-            {myAcceptedGigs.length === 0 ? (
+            {myAcceptedGigs.items.length === 0 ? (
               <div className="text-center py-12">
                 <Briefcase className="w-16 h-16 text-muted-foreground mx-auto mb-4" />
                 <p className="text-muted-foreground">You haven't accepted any gigs yet</p>
               </div>
             ) : (
-              myAcceptedGigs.map((gig) => <GigCard key={gig.id} gig={gig} />)
+              <>
+                {myAcceptedGigs.items.map((gig) => <GigCard key={gig.id} gig={gig} />)}
+                <LoadMore url={`${API_URL}/gigs/my/accepted`} slice={myAcceptedGigs} setSlice={setMyAcceptedGigs} />
+              </>
             )}
           </TabsContent>
         </Tabs>
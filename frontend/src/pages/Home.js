@@ -29,21 +29,17 @@ const Home = () => {
     try {
       const headers = { Authorization: `Bearer ${token}` };
       
-      const [gigsRes, myGigsRes, ordersRes, servicesRes] = await Promise.all([
-        axios.get(`${API_URL}/gigs?status=open`, { headers }),
-        axios.get(`${API_URL}/gigs/my/posted`, { headers }),
-        axios.get(`${API_URL}/orders`, { headers }),
-        axios.get(`${API_URL}/services/my/created`, { headers }),
-      ]);
+      const response = await axios.get(`${API_URL}/home`, { headers });
+      const { open_gigs, my_active_gigs, orders, my_services } = response.data;
 
       setStats({
-        openGigs: gigsRes.data.length,
-        myActiveGigs: myGigsRes.data.filter(g => g.status !== 'completed' && g.status !== 'cancelled').length,
-        totalOrders: ordersRes.data.length,
-        myServices: servicesRes.data.length,
+        openGigs: open_gigs.count,
+        myActiveGigs: my_active_gigs.count,
+        totalOrders: orders.count,
+        myServices: my_services.count,
       });
 
-      setRecentGigs(gigsRes.data.slice(0, 3));
+      setRecentGigs(open_gigs.items);
     } catch (error) {
       console.error('Failed to fetch dashboard data:', error);
       toast.error('Failed to load dashboard data');
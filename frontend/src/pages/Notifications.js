@@ -3,26 +3,49 @@ import axios from 'axios';
 import { useAuth } from '../context/AuthContext';
 import { Header } from '../components/Header';
 import { BottomNav } from '../components/BottomNav';
+import { Button } from '../components/ui/button';
 import { Bell, Check } from 'lucide-react';
 import { toast } from 'sonner';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL + '/api';
 
 const Notifications = () => {
-  const { token } = useAuth();
+  const { token, refresh, logout } = useAuth();
   const [notifications, setNotifications] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [unreadOnly, setUnreadOnly] = useState(false);
 
   useEffect(() => {
     fetchNotifications();
-  }, []);
+  }, [unreadOnly]);
+
+  useEffect(() => {
+    const stream = new EventSource(`${API_URL}/notifications/stream?token=${token}`);
+    stream.addEventListener('notification', (event) => {
+      const notification = JSON.parse(event.data);
+      setNotifications(prev => [notification, ...prev.filter(n => n.id !== notification.id)]);
+    });
+    // EventSource retries dropped connections itself but gives up on a 401, which
+    // is what it gets once the access token expires. Refresh the token; the new
+    // token reopens the stream through this effect.
+    stream.onerror = () => {
+      if (stream.readyState !== EventSource.CLOSED) return;
+      refresh().catch((error) => {
+        console.error('Failed to refresh notification stream:', error);
+        toast.error('Live notifications stopped, please sign in again');
+        logout();
+      });
+    };
+    return () => stream.close();
+  }, [token]);
 
   const fetchNotifications = async () => {
     try {
       const response = await axios.get(`${API_URL}/notifications`, {
-        headers: { Authorization: `Bearer ${token}` }
+        headers: { Authorization: `Bearer ${token}` },
+        params: unreadOnly ? { unread: true } : {},
       });
-      setNotifications(response.data);
+      setNotifications(response.data.items);
     } catch (error) {
       console.error('Failed to fetch notifications:', error);
       toast.error('Failed to load notifications');
@@ -46,6 +69,22 @@ const Notifications = () => {
     }
   };
 
+  const markAllAsRead = async () => {
+    if (notifications.length === 0) return;
+    try {
+      // Everything up to the newest notification on screen, so nothing unseen is cleared
+      await axios.post(
+        `${API_URL}/notifications/read`,
+        { before: notifications[0].created_at },
+        { headers: { Authorization: `Bearer ${token}` } }
+      );
+      setNotifications(unreadOnly ? [] : notifications.map(n => ({ ...n, read: true })));
+    } catch (error) {
+      console.error('Failed to mark notifications as read:', error);
+      toast.error('Failed to mark notifications as read');
+    }
+  };
+
   if (loading) {
     return (
       <div className="min-h-screen flex items-center justify-center">
@@ -62,11 +101,31 @@ const Notifications = () => {
       <Header />
       
       <div className="page-container max-w-4xl mx-auto px-4 py-8">
-        <div className="mb-8">
-          <h1 className="text-3xl md:text-4xl font-bold font-outfit text-primary-foreground mb-2" data-testid="notifications-heading">
-            Notifications
-          </h1>
-          <p className="text-muted-foreground">Stay updated with your activity</p>
+        <div className="flex items-center justify-between mb-8">
+          <div>
+            <h1 className="text-3xl md:text-4xl font-bold font-outfit text-primary-foreground mb-2" data-testid="notifications-heading">
+              Notifications
+            </h1>
+            <p className="text-muted-foreground">Stay updated with your activity</p>
+          </div>
+          <div className="flex items-center gap-2">
+            <Button
+              variant="ghost"
+              data-testid="unread-only-toggle"
+              className="rounded-full"
+              onClick={() => setUnreadOnly(!unreadOnly)}
+            >
+              {unreadOnly ? 'Show all' : 'Unread only'}
+            </Button>
+            <Button
+              data-testid="mark-all-read-btn"
+              className="btn-primary rounded-full"
+              disabled={!notifications.some(n => !n.read)}
+              onClick={markAllAsRead}
+            >
+              <Check className="w-4 h-4 mr-2" /> Mark all read
+            </Button>
+          </div>
         </div>
 
         {notifications.length === 0 ? (
@@ -24,7 +24,7 @@ const Orders = () => {
       const response = await axios.get(`${API_URL}/orders`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setOrders(response.data);
+      setOrders(response.data.items);
     } catch (error) {
       console.error('Failed to fetch orders:', error);
       toast.error('Failed to load orders');
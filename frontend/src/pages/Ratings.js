@@ -29,7 +29,7 @@ const Ratings = () => {
         axios.get(`${API_URL}/ratings/user/${userId}`, { headers }),
       ]);
       setUser(userRes.data);
-      setRatings(ratingsRes.data);
+      setRatings(ratingsRes.data.items);
     } catch (error) {
       console.error('Failed to fetch ratings:', error);
       toast.error('Failed to load ratings');
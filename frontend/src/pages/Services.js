@@ -10,11 +10,12 @@ import { Plus, ShoppingBag, Star } from 'lucide-react';
 import { toast } from 'sonner';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL + '/api';
+const EMPTY_SLICE = { items: [], count: 0, next_cursor: null };
 
 const Services = () => {
   const { token } = useAuth();
-  const [services, setServices] = useState([]);
-  const [myServices, setMyServices] = useState([]);
+  const [services, setServices] = useState(EMPTY_SLICE);
+  const [myServices, setMyServices] = useState(EMPTY_SLICE);
   const [loading, setLoading] = useState(true);
   const [activeTab, setActiveTab] = useState('all');
 
@@ -25,12 +26,9 @@ const Services = () => {
   const fetchServices = async () => {
     try {
       const headers = { Authorization: `Bearer ${token}` };
-      const [allRes, myRes] = await Promise.all([
-        axios.get(`${API_URL}/services`, { headers }),
-        axios.get(`${API_URL}/services/my/created`, { headers }),
-      ]);
-      setServices(allRes.data);
-      setMyServices(myRes.data);
+      const response = await axios.get(`${API_URL}/screens/services`, { headers });
+      setServices(response.data.all);
+      setMyServices(response.data.mine);
     } catch (error) {
       console.error('Failed to fetch services:', error);
       toast.error('Failed to load services');
@@ -39,6 +37,33 @@ const Services = () => {
     }
   };
 
+  const loadMore = async (url, slice, setSlice) => {
+    try {
+      const response = await axios.get(url, {
+        headers: { Authorization: `Bearer ${token}` },
+        params: { cursor: slice.next_cursor },
+      });
+      setSlice({
+        ...slice,
+        items: [...slice.items, ...response.data.items],
+        next_cursor: response.data.next_cursor,
+      });
+    } catch (error) {
+      console.error('Failed to load more services:', error);
+      toast.error('Failed to load more services');
+    }
+  };
+
+  const LoadMore = ({ url, slice, setSlice }) => (
+    slice.next_cursor ? (
+      <div className="text-center pt-2">
+        <Button variant="ghost" className="rounded-full" onClick={() => loadMore(url, slice, setSlice)}>
+          Load more
+        </Button>
+      </div>
+    ) : null
+  );
+
   const ServiceCard = ({ service }) => (
     <Link
       to={`/services/${service.id}`}
@@ -100,26 +125,29 @@ const Services = () => {
         <Tabs value={activeTab} onValueChange={setActiveTab} className="w-full">
           <TabsList className="mb-6 bg-white border border-green-100 p-1 rounded-xl">
             <TabsTrigger value="all" data-testid="tab-all-services" className="rounded-lg">
-              <ShoppingBag className="w-4 h-4 mr-2" /> All Services ({services.length})
+              <ShoppingBag className="w-4 h-4 mr-2" /> All Services ({services.count})
             </TabsTrigger>
             <TabsTrigger value="mine" data-testid="tab-my-services" className="rounded-lg">
-              My Services ({myServices.length})
+              My Services ({myServices.count})
             </TabsTrigger>
           </TabsList>
 
           <TabsContent value="all" className="space-y-4">
-            {services.length === 0 ? (
+            {services.items.length === 0 ? (
               <div className="text-center py-12">
                 <ShoppingBag className="w-16 h-16 text-muted-foreground mx-auto mb-4" />
                 <p className="text-muted-foreground">No services available</p>
               </div>
             ) : (
-              services.map((service) => <ServiceCard key={service.id} service={service} />)
+              <>
+                {services.items.map((service) => <ServiceCard key={service.id} service={service} />)}
+                <LoadMore url={`${API_URL}/services`} slice={services} setSlice={setServices} />
+              </>
             )}
           </TabsContent>
 
           <TabsContent value="mine" className="space-y-4">
-            {myServices.length === 0 ? (
+            {myServices.items.length === 0 ? (
               <div className="text-center py-12">
                 <ShoppingBag className="w-16 h-16 text-muted-foreground mx-auto mb-4" />
                 <p className="text-muted-foreground mb-4">You haven't created any services yet</p>
@@ -130,7 +158,10 @@ const Services = () => {
                 </Link>
               </div>
             ) : (
-              myServices.map((service) => <ServiceCard key={service.id} service={service} />)
+              <>
+                {myServices.items.map((service) => <ServiceCard key={service.id} service={service} />)}
+                <LoadMore url={`${API_URL}/services/my/created`} slice={myServices} setSlice={setMyServices} />
+              </>
             )}
           </TabsContent>
         </Tabs>
@@ -0,0 +1,65 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+# Keep per-IP/per-user budgets out of the way of tests that call the same route repeatedly
+for route in ('SIGNUP', 'LOGIN', 'CREATE_GIG', 'BOOK_SERVICE', 'CREATE_RATING'):
+    os.environ.setdefault(f'RATE_LIMIT_{route}', 'off')
+
+import httpx
+import mongomock.collection
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+_find_and_modify = mongomock.collection.Collection._find_and_modify
+
+def _find_and_modify_keeping_id(self, query, projection=None, *args, **kwargs):
+    # mongomock re-reads the modified document by its _id, or by the original
+    # filter when the projection drops _id; a filter on the field being changed
+    # (every transition() call) then finds nothing. Project exclusions afterwards.
+    doc = _find_and_modify(self, query, None, *args, **kwargs)
+    if doc is None or not projection:
+        return doc
+    return {key: value for key, value in doc.items() if projection.get(key, 1)}
+
+mongomock.collection.Collection._find_and_modify = _find_and_modify_keeping_id
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+@pytest.fixture
+async def db():
+    server.db.connect(AsyncMongoMockClient(tz_aware=True))
+    await server.db.users.create_index("id", unique=True)
+    await server.db.notifications.create_index("id", unique=True)
+    server.open_gig_feed.invalidate()
+    server.service_feed.invalidate()
+    yield server.db
+    server.db.close()
+    server.open_gig_feed.invalidate()
+    server.service_feed.invalidate()
+
+@pytest.fixture
+async def client(db):
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        yield http
+
+@pytest.fixture
+def make_user(db):
+    """Insert a user directly (skipping bcrypt) and return it with an access token."""
+    async def make(name: str = "Test User", **fields):
+        user = server.User(name=name, email=f"{server.uuid.uuid4().hex[:8]}@test.example",
+                           college="Test College", terms_accepted=True, **fields)
+        await db.users.insert_one(user.model_dump())
+        return user, server.token_auth.access_token(user)
+    return make
+
+def auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
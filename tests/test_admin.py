@@ -0,0 +1,29 @@
+import pytest
+
+import server
+from tests.conftest import auth
+
+pytestmark = pytest.mark.anyio
+
+ADMIN_ROUTES = [
+    ("GET", "/api/admin/users"),
+    ("GET", "/api/admin/export/users"),
+    ("POST", "/api/admin/stats/refresh"),
+    ("POST", "/api/admin/ratings/reconcile"),
+    ("GET", "/api/admin/indexes"),
+    ("GET", "/api/admin/password-pool"),
+]
+
+@pytest.mark.parametrize("method,path", ADMIN_ROUTES)
+async def test_admin_routes_reject_other_users(client, make_user, method, path):
+    _, token = await make_user()
+
+    response = await client.request(method, path, headers=auth(token))
+    assert response.status_code == 403
+
+async def test_admin_allowlist_grants_access(client, make_user, monkeypatch):
+    user, token = await make_user()
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {user.email.lower()})
+
+    response = await client.get("/api/admin/password-pool", headers=auth(token))
+    assert response.status_code == 200
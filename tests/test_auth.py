@@ -0,0 +1,43 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+async def test_refresh_rotates_tokens(client, make_user):
+    user, _ = await make_user()
+    issued = await server.token_auth.issue(user)
+
+    response = await client.post("/api/auth/refresh", json={"refresh_token": issued['refresh_token']})
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated['refresh_token'] != issued['refresh_token']
+    assert (await server.token_auth.authenticate(rotated['token'])).id == user.id
+
+    # The rotated-out token is single use
+    response = await client.post("/api/auth/refresh", json={"refresh_token": issued['refresh_token']})
+    assert response.status_code == 401
+
+async def test_refresh_token_reuse_revokes_family(client, make_user):
+    user, _ = await make_user()
+    first = await server.token_auth.issue(user)
+    second = (await client.post("/api/auth/refresh", json={"refresh_token": first['refresh_token']})).json()
+
+    # Replaying the spent token means it leaked: the whole family goes, including the live token
+    assert (await client.post("/api/auth/refresh", json={"refresh_token": first['refresh_token']})).status_code == 401
+    assert (await client.post("/api/auth/refresh", json={"refresh_token": second['refresh_token']})).status_code == 401
+    assert await server.db.refresh_tokens.count_documents({"user_id": user.id}) == 0
+
+async def test_refresh_does_not_cross_families(client, make_user):
+    user, _ = await make_user()
+    laptop = await server.token_auth.issue(user)
+    phone = await server.token_auth.issue(user)
+    await client.post("/api/auth/refresh", json={"refresh_token": laptop['refresh_token']})
+    await client.post("/api/auth/refresh", json={"refresh_token": laptop['refresh_token']})
+
+    response = await client.post("/api/auth/refresh", json={"refresh_token": phone['refresh_token']})
+    assert response.status_code == 200
+
+async def test_unknown_refresh_token_is_rejected(client):
+    response = await client.post("/api/auth/refresh", json={"refresh_token": "not-a-token"})
+    assert response.status_code == 401
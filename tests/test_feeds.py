@@ -0,0 +1,89 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+BASE = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+async def seed_gigs(db, count: int, **fields):
+    gigs = [server.Gig(
+        title=f"Gig {i}", description="Feed test", category="coding" if i % 2 else "design",
+        price=100 * (i + 1), poster_id="poster", poster_name="Poster",
+        created_at=BASE + timedelta(minutes=i), **fields
+    ) for i in range(count)]
+    await db.gigs.insert_many([gig.model_dump() for gig in gigs])
+    return gigs
+
+async def walk(client, params: dict) -> list:
+    seen, cursor = [], None
+    while True:
+        response = await client.get("/api/gigs", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = response.json()
+        seen += [item['title'] for item in page['items']]
+        cursor = page['next_cursor']
+        if not cursor:
+            return seen
+
+@pytest.mark.parametrize("snapshot_limit", [50, 3])
+async def test_feed_pages_newest_first_through_cursor(client, db, monkeypatch, snapshot_limit):
+    # A snapshot smaller than the feed sends later pages to Mongo
+    monkeypatch.setattr(server.open_gig_feed, "snapshot_limit", snapshot_limit)
+    await seed_gigs(db, 7)
+    await db.gigs.insert_one(server.Gig(title="Taken", description="", category="coding", price=1,
+                                        poster_id="p", poster_name="P", status="accepted").model_dump())
+
+    assert await walk(client, {"status": "open", "limit": 2}) == [f"Gig {i}" for i in range(6, -1, -1)]
+
+async def test_feed_filters_apply_across_pages(client, db):
+    await seed_gigs(db, 10)
+
+    titles = await walk(client, {"status": "open", "limit": 2, "category": "coding", "min_price": 300, "max_price": 900})
+    assert titles == ["Gig 7", "Gig 5", "Gig 3"]
+
+async def test_feed_etag_revalidates_until_a_write(client, db):
+    await seed_gigs(db, 3)
+
+    first = await client.get("/api/gigs", params={"status": "open"})
+    etag = first.headers['etag']
+    again = await client.get("/api/gigs", params={"status": "open"}, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+    await seed_gigs(db, 1)
+    server.open_gig_feed.invalidate()
+    changed = await client.get("/api/gigs", params={"status": "open"}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers['etag'] != etag
+
+def encode(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+def test_cursor_round_trips():
+    doc = {"created_at": BASE, "id": "gig-1"}
+    assert server.decode_cursor(server.encode_cursor(doc)) == (BASE, "gig-1")
+    assert server.decode_cursor(server.encode_cursor({"created_at": BASE.isoformat(), "id": "gig-1"})) == (BASE.isoformat(), "gig-1")
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"not json").decode('ascii'),
+    encode({"created_at": "2024-01-01", "id": "x"}),
+    encode(["2024-01-01T00:00:00+00:00", "x"]),
+    encode(["not a date", "x", True]),
+    encode([{"$gt": ""}, "x", False]),
+    encode(["2024-01-01T00:00:00+00:00", {"$gt": ""}, True]),
+    encode(["2024-01-01T00:00:00+00:00", "x", "yes"]),
+])
+def test_decode_cursor_rejects_malformed_input(cursor):
+    with pytest.raises(server.HTTPException) as exc:
+        server.decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+async def test_malformed_cursor_is_a_client_error(client, db):
+    response = await client.get("/api/gigs", params={"cursor": encode([{"$gt": ""}, "x", False])})
+    assert response.status_code == 400
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+import server
+from tests.conftest import auth
+
+pytestmark = pytest.mark.anyio
+
+async def make_gig(db, poster, **fields):
+    gig = server.Gig(title="Move a couch", description="Two flights of stairs", category="moving",
+                     price=400, poster_id=poster.id, poster_name=poster.name, **fields)
+    await db.gigs.insert_one(gig.model_dump())
+    return gig
+
+async def test_transition_only_matches_allowed_source_status(db, make_user):
+    poster, _ = await make_user()
+    gig = await make_gig(db, poster, status="completed")
+
+    assert await server.transition(db.gigs, gig.id, "cancelled", server.GIG_TRANSITIONS) is None
+    assert (await db.gigs.find_one({"id": gig.id}))['status'] == "completed"
+
+async def test_transition_applies_guard_and_changes(db, make_user):
+    poster, _ = await make_user()
+    gig = await make_gig(db, poster)
+
+    assert await server.transition(db.gigs, gig.id, "accepted", server.GIG_TRANSITIONS,
+                                   guard={"poster_id": {"$ne": poster.id}}) is None
+    updated = await server.transition(db.gigs, gig.id, "accepted", server.GIG_TRANSITIONS,
+                                      guard={"poster_id": {"$ne": "someone-else"}}, changes={"acceptor_id": "a1"})
+    assert updated['status'] == "accepted"
+    assert updated['acceptor_id'] == "a1"
+
+async def test_cannot_accept_own_gig(client, db, make_user):
+    poster, token = await make_user()
+    gig = await make_gig(db, poster)
+
+    response = await client.post(f"/api/gigs/{gig.id}/accept", headers=auth(token))
+    assert response.status_code == 400
+    assert response.json()['detail'] == "Cannot accept your own gig"
+    assert (await db.gigs.find_one({"id": gig.id}))['status'] == "open"
+    assert await db.orders.count_documents({}) == 0
+
+async def test_concurrent_accepts_have_one_winner(client, db, make_user):
+    poster, _ = await make_user()
+    gig = await make_gig(db, poster)
+    tokens = [(await make_user(f"Helper {i}"))[1] for i in range(4)]
+
+    responses = await asyncio.gather(*(
+        client.post(f"/api/gigs/{gig.id}/accept", headers=auth(token)) for token in tokens
+    ))
+    assert sorted(r.status_code for r in responses) == [200, 400, 400, 400]
+    assert {r.json()['detail'] for r in responses if r.status_code == 400} == {"Gig not available"}
+    assert await db.orders.count_documents({"gig_id": gig.id}) == 1
+
+async def test_status_endpoint_cannot_set_accepted(client, db, make_user):
+    poster, token = await make_user()
+    gig = await make_gig(db, poster)
+
+    response = await client.put(f"/api/gigs/{gig.id}/status", json={"status": "accepted"}, headers=auth(token))
+    assert response.status_code == 422
+    assert (await db.gigs.find_one({"id": gig.id}))['status'] == "open"
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+async def seed_stale_names(db, user_id: str, name: str, gigs: int = 3):
+    await db.users.insert_one({"id": user_id, "name": name})
+    await db.gigs.insert_many([{"id": f"g{i}", "poster_id": user_id, "poster_name": "Old Name"} for i in range(gigs)])
+    await db.orders.insert_one({"id": "o1", "buyer_id": user_id, "buyer_name": "Old Name",
+                                "provider_id": "other", "provider_name": "Other"})
+
+async def run_until(fanout: server.NameFanout, jobs: int):
+    task = asyncio.create_task(fanout.run())
+    try:
+        for _ in range(200):
+            if fanout.jobs >= jobs:
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError(f"fan-out finished {fanout.jobs} of {jobs} jobs")
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+async def test_run_resumes_recorded_jobs(db):
+    await seed_stale_names(db, "u1", "New Name")
+    # Left behind by a worker that stopped before fanning out
+    await db.name_fanout.insert_one({"_id": "u1", "queued_at": datetime(2024, 1, 1, tzinfo=timezone.utc)})
+    fanout = server.NameFanout(batch_size=2, batch_delay=0)
+
+    await run_until(fanout, 1)
+
+    assert await db.gigs.count_documents({"poster_name": "New Name"}) == 3
+    assert (await db.orders.find_one({"id": "o1"}))['buyer_name'] == "New Name"
+    assert (await db.orders.find_one({"id": "o1"}))['provider_name'] == "Other"
+    assert await db.name_fanout.count_documents({}) == 0
+    assert fanout.updated == 4
+
+async def test_repeated_renames_collapse_into_one_pass(db):
+    await seed_stale_names(db, "u1", "Second Name")
+    fanout = server.NameFanout(batch_size=10, batch_delay=0)
+    fanout.queue = asyncio.Queue()
+
+    await fanout.submit("u1")
+    await fanout.submit("u1")
+    assert fanout.queue.qsize() == 1
+    assert await db.name_fanout.count_documents({}) == 1
+
+    await run_until(fanout, 1)
+    await asyncio.sleep(0.05)
+
+    assert fanout.jobs == 1
+    assert await db.gigs.count_documents({"poster_name": "Second Name"}) == 3
+
+async def test_rename_during_pass_keeps_its_job(db):
+    await seed_stale_names(db, "u1", "New Name")
+    fanout = server.NameFanout(batch_size=10, batch_delay=0)
+    # queued_at after the pass started: a later rename the pass may have missed
+    await db.name_fanout.insert_one({"_id": "u1", "queued_at": datetime(2999, 1, 1, tzinfo=timezone.utc)})
+
+    await fanout.fan_out("u1")
+
+    assert await db.name_fanout.count_documents({"_id": "u1"}) == 1
@@ -0,0 +1,67 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+def entry(notif_id: str, user_id: str = "u1", attempts: int = 0):
+    return ({"id": notif_id, "user_id": user_id}, {"id": notif_id}, server.time.perf_counter(), attempts)
+
+@pytest.fixture
+def published(monkeypatch):
+    sent = []
+    monkeypatch.setattr(server.notification_broker, "publish", lambda user_id, payload: sent.append(payload['id']))
+    return sent
+
+async def test_partial_batch_publishes_inserted_and_returns_failures(db, published, monkeypatch):
+    writer = server.NotificationWriter(10, 0.01, 100)
+    insert_many = type(db.notifications).insert_many
+
+    async def rejects_second(collection, docs, **kwargs):
+        await insert_many(collection, [docs[0], docs[2]])
+        raise server.BulkWriteError({"writeErrors": [{"index": 1, "code": 121, "errmsg": "Document failed validation"}],
+                                     "nInserted": 2})
+
+    monkeypatch.setattr(type(db.notifications), "insert_many", rejects_second)
+    retry = await writer.flush([entry("n1"), entry("n2"), entry("n3")])
+
+    assert [doc['id'] for doc, _, _, _ in retry] == ["n2"]
+    assert published == ["n1", "n3"]
+    assert writer.written == 2
+
+async def test_duplicate_ids_count_as_written(db, published):
+    writer = server.NotificationWriter(10, 0.01, 100)
+    await db.notifications.insert_one({"id": "n1", "user_id": "u1"})
+
+    assert await writer.flush([entry("n1"), entry("n2")]) == []
+    assert published == ["n1", "n2"]
+
+async def test_requeue_is_bounded(db):
+    writer = server.NotificationWriter(10, 0.01, 100, retries=2)
+
+    writer.requeue([entry("n1", attempts=0), entry("n2", attempts=2)])
+
+    assert writer.queue.qsize() == 1
+    assert writer.queue.get_nowait()[3] == 1
+    assert writer.retried == 1
+    assert writer.failed == 1
+
+async def test_failed_writes_are_retried_until_stored(db, published, monkeypatch):
+    writer = server.NotificationWriter(10, 0.01, 100, retries=3, retry_delay=0.01)
+    insert_many = type(db.notifications).insert_many
+    failures = [server.OperationFailure("primary stepped down")]
+
+    async def flaky(collection, docs, **kwargs):
+        if failures:
+            raise failures.pop()
+        return await insert_many(collection, docs, **kwargs)
+
+    monkeypatch.setattr(type(db.notifications), "insert_many", flaky)
+    writer.start()
+    for i in range(3):
+        await writer.submit({"id": f"n{i}", "user_id": "u1"}, {"id": f"n{i}"})
+    await writer.drain(2)
+
+    assert await db.notifications.count_documents({}) == 3
+    assert sorted(published) == ["n0", "n1", "n2"]
+    assert (writer.written, writer.failed, writer.retried) == (3, 0, 3)
@@ -0,0 +1,43 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: now[0])
+    return now
+
+async def test_bucket_denies_once_capacity_is_spent(clock):
+    backend = server.LocalRateLimitBackend(max_keys=10)
+
+    assert [await backend.take("ip:1", 3, 0.5) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Empty bucket refilling at 0.5 tokens/s: the next token is 2s away
+    assert await backend.take("ip:1", 3, 0.5) == pytest.approx(2.0)
+
+async def test_bucket_refills_over_time_up_to_capacity(clock):
+    backend = server.LocalRateLimitBackend(max_keys=10)
+    for _ in range(3):
+        await backend.take("ip:1", 3, 0.5)
+
+    clock[0] += 1.0
+    assert await backend.take("ip:1", 3, 0.5) == pytest.approx(1.0)
+    clock[0] += 1.0
+    assert await backend.take("ip:1", 3, 0.5) == 0.0
+
+    # A long idle period refills to capacity, not beyond
+    clock[0] += 3600
+    assert [await backend.take("ip:1", 3, 0.5) for _ in range(4)][-1] > 0
+
+async def test_buckets_are_independent_and_evicted_lru(clock):
+    backend = server.LocalRateLimitBackend(max_keys=2)
+    await backend.take("a", 1, 1)
+    assert await backend.take("b", 1, 1) == 0.0
+    await backend.take("a", 1, 1)
+    await backend.take("c", 1, 1)
+
+    assert len(backend) == 2
+    # "b" was least recently used, so it starts over with a full bucket
+    assert await backend.take("b", 1, 1) == 0.0